@@ -0,0 +1,198 @@
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+import traceback
+
+import numpy as np
+
+from cache import Cache
+from curves import Oval, Curve, Ellipse
+from geometry import Frechet, Point, Projection
+from main import Helper
+
+
+# a job file is a JSON list of jobs (or {"jobs": [...]}), a job is
+#   {
+#     "name": "oval_1", "step": 0.0001, "wurfs": [2, 1.5], "decimate": 16, "resample": 1000,
+#     "count": 5, "stride": 1,
+#     "e1": [5, 1], "e2": {"a": 1, "b": 1, "offset": [0, 0]}, "center": [2, 0],
+#     "projections": [
+#       [1.5, 1, 0, 1, 2, 0, 0, 0.2],
+#       {"coefficients": [1.5, 1, 0, 1, 2, 0, 0.2, 0.1], "start": 1, "every": 2},
+#       [[1.5, 1, 0], [1, 2, 0], [0, 0.2, 1]]
+#     ]
+#   }
+# projections are the eight Projection coefficients or a 3x3 matrix, every
+# projection maps oval.points[start::every] like Helper.main_main does,
+# without projections the oval itself is the only view; with decimate the
+# conjugation points are searched coarse to fine, resample is the point count
+# of the inner curves for the wurf map, count and stride those of the conic fits
+
+
+def ellipse(spec, step):
+    if isinstance(spec, dict):
+        offset_x, offset_y = spec.get('offset', (0, 0))
+        return Ellipse(spec['a'], spec['b'], step, offset_x, offset_y)
+    return Ellipse(spec[0], spec[1], step)
+
+
+def view(oval, spec, step):
+    if spec is None:
+        return oval
+    if isinstance(spec, dict):
+        coefficients, start, every = spec['coefficients'], spec.get('start', 0), spec.get('every', 1)
+    else:
+        coefficients, start, every = spec, 0, 1
+    if np.shape(coefficients) == (3, 3):
+        projection = Projection.from_matrix(coefficients)
+    else:
+        projection = Projection(*coefficients)
+    return Curve.from_proj(projection, oval.points[start::every], step)
+
+
+def run_job(job, cache=None, report=False):
+    # with a cache.Cache the sampled oval, its views and every stage of
+    # Helper.pipeline are memoized by the parameters that generate them
+    step = job.get('step', 0.001)
+    wurfs = job.get('wurfs', (2, 1.5))
+    center = job.get('center', (0, 0))
+    oval_key = ['oval', job['e1'], job['e2'], center, step]
+
+    def memoize(params, compute):
+        return compute() if cache is None else cache.memoize(params, compute)
+
+    def sample_oval():
+        e1, e2 = ellipse(job['e1'], step), ellipse(job['e2'], step)
+        return {'points': Oval(e1, e2, Point(*center), step).points.xy}
+
+    ovals = []
+
+    def oval():
+        # sampled at most once, and not at all if every view is cached
+        if not ovals:
+            ovals.append(Curve.from_points(memoize(oval_key, sample_oval)['points'], step))
+        return ovals[0]
+
+    views, signatures = [], []
+    for spec in job.get('projections') or [None]:
+        key = ['view', oval_key, spec]
+        points = memoize(key, lambda: {'points': view(oval(), spec, step).points.xy})['points']
+        curve = Curve.from_points(points, step)
+        result = Helper.pipeline(
+            curve, wurfs, cache, key, report, job.get('decimate'), job.get('resample'),
+            job.get('count', 5), job.get('stride', 1),
+        )
+        cross_point = result['cross_point']
+        signatures.append(np.asarray(result['signature'].xy))
+        views.append({
+            'points': len(curve.points),
+            'cross_point': [cross_point.x, cross_point.y],
+            'wurf_map': len(result['wurf_map']),
+            'signature': len(result['signature']),
+        })
+        if report:
+            views[-1]['report'] = result['report']
+    distances = Frechet.pairwise(signatures, workers=1)
+    return {'views': views}, signatures, distances
+
+
+def _child(job, connection, cache, report):
+    try:
+        connection.send(('done',) + run_job(job, cache, report))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def run(jobs, workers=None, timeout=None, cache=None, report=False):
+    # yields (index, status, payload) as the jobs finish; every job runs in
+    # its own process, so a job over its timeout is killed without taking a
+    # pool down with it, and no two jobs ever share a pyplot state
+    workers = workers or multiprocessing.cpu_count()
+    pending, running = list(enumerate(jobs)), {}
+    while pending or running:
+        while pending and len(running) < workers:
+            i, job = pending.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_child, args=(job, sender, cache, report), daemon=True)
+            process.start()
+            sender.close()
+            running[i] = (process, receiver, time.time())
+        ready = multiprocessing.connection.wait([r for p, r, t in running.values()], timeout=0.1)
+        for i, (process, receiver, started) in list(running.items()):
+            if receiver in ready:
+                try:
+                    message = receiver.recv()
+                except EOFError:
+                    message = ('error', 'worker exited with code {}'.format(process.exitcode))
+            elif timeout and time.time() - started > timeout:
+                process.kill()
+                message = ('timeout', 'killed after {} s'.format(timeout))
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[i]
+            yield i, message[0], message[1:], time.time() - started
+
+
+def save(out, name, signatures, distances):
+    arrays = {'signature_{}'.format(k): s for k, s in enumerate(signatures)}
+    np.savez(os.path.join(out, name + '.npz'), distances=distances, **arrays)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Compute wurf signatures of many ovals and projections')
+    parser.add_argument('jobs', help='JSON job file')
+    parser.add_argument('-o', '--out', default='results', help='output directory')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='processes, all cores by default')
+    parser.add_argument('-t', '--timeout', type=float, default=None, help='seconds per job')
+    parser.add_argument('--pairwise', action='store_true', help='also compare the signatures of all jobs')
+    parser.add_argument('-c', '--cache', default=None, help='directory to memoize the stages in')
+    parser.add_argument('--cache-size', type=float, default=1024, help='cache limit in MB')
+    parser.add_argument(
+        '--report', nargs='?', const=True, default=False, choices=[True, 'profile'],
+        help='add stage times and counters to results.json, "profile" also samples',
+    )
+    args = parser.parse_args(args)
+
+    with open(args.jobs) as f:
+        jobs = json.load(f)
+    if isinstance(jobs, dict):
+        jobs = jobs['jobs']
+    names = [job.get('name', 'job_{}'.format(i)) for i, job in enumerate(jobs)]
+    if len(set(names)) != len(names):
+        raise Exception('Job names must be unique')
+    os.makedirs(args.out, exist_ok=True)
+    cache = Cache(args.cache, int(args.cache_size * 2 ** 20)) if args.cache else None
+
+    report, everything = [None] * len(jobs), []
+    for i, status, payload, elapsed in run(jobs, args.workers, args.timeout, cache, args.report):
+        entry = {'name': names[i], 'status': status, 'time': elapsed}
+        if status == 'done':
+            summary, signatures, distances = payload
+            save(args.out, names[i], signatures, distances)
+            entry.update(summary, distances=distances.tolist())
+            everything += [('{}/{}'.format(names[i], k), s) for k, s in enumerate(signatures)]
+        else:
+            entry['error'] = payload[0]
+        report[i] = entry
+        print('{} {} {:.2f}s'.format(names[i], status, elapsed))
+
+    if args.pairwise and everything:
+        distances = Frechet.pairwise([s for name, s in everything], args.workers)
+        np.savez(
+            os.path.join(args.out, 'pairwise.npz'),
+            names=np.asarray([name for name, s in everything]), distances=distances,
+        )
+    with open(os.path.join(args.out, 'results.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from curves import Oval, Curve, Ellipse, Circle
+from geometry import Frechet, Point, Projection, Segment
+from main import Helper
+
+
+# the two ovals and projections of main.py, every stage is timed on its own
+# as the best of a few repeats; n is the point count the stage works on, the
+# exponent of time ~ n^k over the steps is fitted per stage and flagged when
+# it looks quadratic; times under the floor are mostly call overhead and
+# left out of the fit
+STEPS = (1e-2, 1e-3, 1e-4, 1e-5)
+REPEATS = 3
+FLOOR = 1e-3
+QUADRATIC = 1.5
+
+
+def stages(step):
+    # yields (name, n, compute) in pipeline order, every compute takes the
+    # results so far and returns what it adds to them, n is taken from the
+    # results once the stage is done
+    yield 'ellipse', lambda r: len(r['e1'].points) + len(r['e2'].points), lambda r: {
+        'e1': Ellipse(5, 1, step), 'e2': Circle(1, 0, 0, step),
+    }
+    yield 'oval', lambda r: len(r['e1'].points) + len(r['e2'].points), lambda r: {
+        'oval': Oval(r['e1'], r['e2'], Point(2, 0), step),
+    }
+    yield 'from_proj', lambda r: len(r['oval'].points), lambda r: {
+        'views': [
+            Curve.from_proj(Projection(1.5, 1, 0, 1, 2, 0, 0, 0.2), r['oval'].points[0::2], step),
+            Curve.from_proj(Projection(1.5, 1, 0, 1, 2, 0, 0.2, 0.1), r['oval'].points[1::2], step),
+        ],
+    }
+    yield 'calculate', lambda r: len(r['views'][0].points), lambda r: {
+        'values': [Helper.calculate(view.points) for view in r['views']],
+    }
+    yield 'find_conjugation_points', lambda r: len(r['views'][0].points), lambda r: {
+        'conjugation_points': [
+            Helper.find_conjugation_points(view.points, values)
+            for view, values in zip(r['views'], r['values'])
+        ],
+    }
+    yield 'get_inner_curve', lambda r: len(r['views'][0].points), lambda r: {
+        'inner_curves': [
+            [Curve.from_points(Helper.get_inner_curve(view, cross(points), wurf, 1), step) for wurf in (2, 1.5)]
+            for view, points in zip(r['views'], r['conjugation_points'])
+        ],
+    }
+    yield 'wurf_mapping', lambda r: len(r['views'][0].points), lambda r: {
+        'wurf_maps': [
+            Helper.wurf_mapping(first, second, view)
+            for view, (first, second) in zip(r['views'], r['inner_curves'])
+        ],
+    }
+    yield 'filter_outliers', lambda r: len(r['wurf_maps'][0]), lambda r: {
+        'signatures': [Helper.filter_outliers(wurf_map) for wurf_map in r['wurf_maps']],
+    }
+    # the coupling matrix of two signatures is n * m, its side is the n
+    # whose square the cost goes with
+    yield 'frechet', lambda r: int(round((len(r['signatures'][0]) * len(r['signatures'][1])) ** 0.5)), lambda r: {
+        'distance': Frechet.dist(*r['signatures']),
+    }
+
+
+def cross(points):
+    return Segment.cross(Segment(points[0], points[2]), Segment(points[1], points[3]))
+
+
+def run(step, memory=True, repeats=REPEATS):
+    # one pass for the times, every stage repeated and the best kept, and
+    # one more under tracemalloc for the peaks, which would otherwise slow
+    # the timed pass down
+    records, results = [], {}
+    for name, size, compute in stages(step):
+        record = {'stage': name, 'step': step, 'n': None, 'time': None}
+        records.append(record)
+        try:
+            for repeat in range(max(repeats, 1)):
+                started = time.perf_counter()
+                added = compute(results)
+                elapsed = time.perf_counter() - started
+                if record['time'] is None or elapsed < record['time']:
+                    record['time'] = elapsed
+        except Exception as e:
+            record['time'] = None
+            record['error'] = '{}: {}'.format(type(e).__name__, e)
+            break
+        results.update(added)
+        record['n'] = size(results)
+    if memory:
+        results = {}
+        tracemalloc.start()
+        for record, (name, size, compute) in zip(records, stages(step)):
+            if record['time'] is None:
+                break
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            results.update(compute(results))
+            record['peak_memory'] = tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+    for record in records:
+        record.setdefault('peak_memory', None)
+    return records
+
+
+def exponents(records, floor=FLOOR):
+    # slope of log(time) over log(n) for every stage, fitted over the steps
+    # whose time is at least floor
+    result = {}
+    for name in dict.fromkeys(record['stage'] for record in records):
+        points = [
+            (record['n'], record['time']) for record in records
+            if record['stage'] == name and record.get('time') and record['time'] >= floor and record['n']
+        ]
+        if len({n for n, t in points}) < 2:
+            continue
+        n, t = np.log(np.asarray(points, dtype=float)).T
+        k = float(np.polyfit(n, t, 1)[0])
+        result[name] = {'exponent': k, 'quadratic': k > QUADRATIC}
+    return result
+
+
+def line(record):
+    if record.get('error'):
+        result = record['error']
+    else:
+        result = '{:.4f}s'.format(record['time'])
+        if record['peak_memory'] is not None:
+            result += ' {:.1f}MB'.format(record['peak_memory'] / 2 ** 20)
+    return '{:>24} step={:<8g} n={:<9} {}'.format(record['stage'], record['step'], str(record['n']), result)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Time every stage of the wurf pipeline over step sizes')
+    parser.add_argument('-s', '--steps', type=float, nargs='+', default=STEPS)
+    parser.add_argument('-o', '--out', default='benchmark.json', help='JSON results')
+    parser.add_argument('-r', '--repeats', type=int, default=REPEATS, help='timed runs of every stage, the best is kept')
+    parser.add_argument('--floor', type=float, default=FLOOR, help='seconds, faster stages are not fitted')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    args = parser.parse_args(args)
+
+    records = []
+    for step in args.steps:
+        for record in run(step, not args.no_memory, args.repeats):
+            records.append(record)
+            print(line(record))
+    fitted = exponents(records, args.floor)
+    for name, value in fitted.items():
+        print('{:>24} n^{:.2f}{}'.format(name, value['exponent'], '  quadratic' if value['quadratic'] else ''))
+    with open(args.out, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'repeats': args.repeats,
+            'floor': args.floor,
+            'records': records,
+            'exponents': fitted,
+        }, f, indent=2)
+    return records, fitted
+
+
+if __name__ == '__main__':
+    main()
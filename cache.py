@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import instrument
+
+
+def source_salt():
+    # changes whenever the code that computes the cached stages changes
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in ('curves.py', 'geometry.py', 'main.py', 'wurf.py'):
+        with open(os.path.join(directory, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class Cache:
+    # content addressed store of named arrays: an entry is a directory of .npy
+    # files named by the hash of its parameters and the salt, read back as
+    # memory maps; the least recently used entries go once limit bytes are
+    # exceeded
+
+    def __init__(self, directory, limit=2 ** 30, salt=None):
+        super(Cache, self).__init__()
+        self.directory = directory
+        self.limit = limit
+        self.salt = source_salt() if salt is None else salt
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, params):
+        text = json.dumps([self.salt, params], sort_keys=True, default=Cache.encode)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    @staticmethod
+    def encode(value):
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, (tuple, set)):
+            return list(value)
+        raise TypeError('{} can not be a cache key'.format(type(value).__name__))
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def load(self, key):
+        path = self.path(key)
+        try:
+            names = os.listdir(path)
+        except FileNotFoundError:
+            return None
+        try:
+            result = {
+                name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+                for name in names if name.endswith('.npy')
+            }
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # evicted or replaced by another process meanwhile
+            return None
+        return result
+
+    def store(self, key, arrays):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written aside and renamed, so that readers never see half an entry
+        temporary = tempfile.mkdtemp(prefix='.', dir=os.path.dirname(path))
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, name + '.npy'), np.asarray(array))
+        try:
+            os.rename(temporary, path)
+        except OSError:
+            # the same entry was stored by another process
+            shutil.rmtree(temporary, ignore_errors=True)
+        self.evict()
+        return self.load(key) or arrays
+
+    def memoize(self, params, compute):
+        key = self.key(params)
+        result = self.load(key)
+        if result is None:
+            instrument.count('cache.misses')
+            result = self.store(key, compute())
+        else:
+            instrument.count('cache.hits')
+        return result
+
+    def entries(self):
+        result = []
+        for prefix in os.listdir(self.directory):
+            directory = os.path.join(self.directory, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for key in os.listdir(directory):
+                if key.startswith('.'):
+                    continue
+                path = os.path.join(directory, key)
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(path))
+                    result.append((os.stat(path).st_mtime, size, path))
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+        return result
+
+    def size(self):
+        return sum(size for used, size, path in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for used, size, path in entries)
+        for used, size, path in entries:
+            if total <= self.limit:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for used, size, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
@@ -1,18 +1,36 @@
-from geometry import Point, Segment
+from geometry import Point, PointArray, Projection, Segment, SegmentGrid
 import numpy as np
-import matplotlib.pyplot as plt
 import math
+import os
 import sys
 
+import instrument
+
 
 class Curve:
 
     def __init__(self, step):
         super(Curve, self).__init__()
-        self.points = []
+        self.points = PointArray(parent=self)
         self.step = step
         self.default_range = (-10, 10)
 
+    @property
+    def points(self):
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = PointArray.from_points(points)
+        self._grid = None
+
+    @property
+    def grid(self):
+        if self._grid is None:
+            with instrument.stage('segment_grid'):
+                self._grid = SegmentGrid(self.points)
+        return self._grid
+
     def add_points(self, p1, p2):
         if (
                 Segment(p1, p2).len > self.step
@@ -41,30 +59,57 @@ class Curve:
         current = a1
         while current <= a2:
             y = self.y(current)
-            p1 = Point(current, y[0], self)
-            p2 = Point(current, y[1], self)
-            # if p1.y is not None:
-            #     if len(r1) == 0:
-            #         r1.append(p1)
-            #     else:
-            #         r1 += self.handle_point(r1[-1], p1)
-            # if p2.y is not None:
-            #     if len(r2) == 0:
-            #         r2.append(p2)
-            #     else:
-            #         r2 += self.handle_point(r2[-1], p2)
-            r1.append(p1)
-            r2.append(p2)
+            if y[0] is not None:
+                r1.append((current, y[0]))
+            if y[1] is not None:
+                r2.append((current, y[1]))
             current += self.step
-        f_l = lambda p: (
-                (p.x is not None) and
-                (p.y is not None)
-            )
-        return list(filter(f_l, r1)) + list(filter(f_l, r2))
+        return PointArray(r1 + r2, self)
+
+    def save(self, path, dtype=None, chunk=2 ** 20):
+        # .npy, or raw interleaved x, y values for any other name; written
+        # chunk by chunk, so a memory mapped curve is never loaded whole
+        xy = self.points.xy
+        dtype = np.dtype(dtype or xy.dtype)
+        if not len(xy):
+            if path.endswith('.npy'):
+                np.save(path, np.empty((0, 2), dtype))
+            else:
+                open(path, 'wb').close()
+            return
+        if path.endswith('.npy'):
+            out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=xy.shape)
+        else:
+            out = np.memmap(path, dtype=dtype, mode='w+', shape=xy.shape)
+        for start, part in zip(range(0, len(xy), chunk), self.points.chunks(chunk)):
+            out[start:start + len(part)] = part.xy
+        out.flush()
+        del out
+
+    @staticmethod
+    def load(path, step, dtype=np.float64, compact=False, chunk=2 ** 20):
+        # a .npy file, or raw interleaved x, y values of dtype, memory mapped
+        # so that pages are only read once a stage touches them; compact
+        # keeps the points in float32, converted chunk by chunk; that is for
+        # storage only, the conic fits of Helper.pipeline refuse float32
+        # points, their rounding is coarser than the plateau test
+        if path.endswith('.npy'):
+            xy = np.load(path, mmap_mode='r')
+        elif os.path.getsize(path):
+            xy = np.memmap(path, dtype=dtype, mode='r')
+        else:
+            xy = np.empty(0, dtype)
+        xy = xy.reshape(-1, 2)
+        if compact and xy.dtype != np.float32:
+            result = np.empty(xy.shape, dtype=np.float32)
+            for start, part in zip(range(0, len(xy), chunk), PointArray(xy).chunks(chunk)):
+                result[start:start + len(part)] = part.xy
+            xy = result
+        return Curve.from_points(xy, step)
 
     def draw(self):
-        x = np.asarray([p.x for p in self.points])
-        y = np.asarray([p.y for p in self.points])
+        import matplotlib.pyplot as plt
+        x, y = self.points.x, self.points.y
         plt.scatter(x, y, [2 for i in x])
         # plt.show()
 
@@ -86,24 +131,11 @@ class Curve:
             return Segment.from_line_and_point(k, b, current)
 
     def cross_segment(self, segment):
-        result = []
-        y = lambda x: segment.k * x + segment.b
-        cache = {"{}-{}".format(p.x, p.y): Segment(p, Point(p.x, y(p.x))).len for p in self.points}
-        def min_p(points, prev=None, delta=1):
-            r = []
-            if not prev:
-                dists = [cache["{}-{}".format(p.x, p.y)] for p in points]
-            else:
-                dists = [cache["{}-{}".format(p.x, p.y)] / Segment(p, prev).len for p in points]
-            m_v = min(dists)
-            if m_v < delta:
-                r.append(points[dists.index(m_v)])
-            return r
-        result += min_p(self.points)
-        if result:
-            index = self.points.index(result[0])
-            points = self.points[:index] + self.points[index+1:]
-            result += min_p(points, prev=result[-1])
+        crossing, count = self.grid.cross_lines(
+            (segment.p1.x, segment.p1.y),
+            (segment.p2.x - segment.p1.x, segment.p2.y - segment.p1.y),
+        )
+        result = [Point(x, y, self) for x, y in crossing[0, :min(count[0], 2)].tolist()]
         return list(sorted(result, key=lambda item: Segment(item, segment.p1).len))
 
     def y(self, x):
@@ -115,37 +147,104 @@ class Curve:
         r.points = points
         return r
 
+    @staticmethod
+    def from_projs(projections, parent_points, step):
+        result = []
+        for points in Projection.transform_many(projections, parent_points):
+            curve = Curve(step)
+            curve.points = points
+            result.append(curve)
+        return result
+
     @staticmethod
     def from_proj(projection, parent_points, step):
-        points = list(projection.transform(parent_points))
+        points = projection.transform(parent_points)
         result = Curve(step)
-
-        # resampled = [points[0]]
-        # for i in range(1, len(points)):
-        #     if Segment(resampled[-1], points[i]).len > step:
-        #         resampled += list(projection.transform(
-        #             result.handle_point(parent_points[i-1], parent_points[i])
-        #         ))
-        # result.points = resampled
-        # result.points = result.filter_nearest(result.points, result.step)
-
         result.points = points
         return result
 
-    def filter_nearest(self, points, delta):
-        l_2 = int(len(points)/2)
-        r1, r2 = [points[0]], [points[-1]]
-        for i in range(1, l_2):
-            c1, c2 = points[i], points[len(points) - i]
-            l1, l2 = r1[-1], r2[-1]
-            if Segment(c1, l1).len**2 > delta and Segment(c2, l2).len**2 > delta:
-                r1.append(c1)
-                r2.append(c2)
-        return r1 + r2[::-1]
+    def resample(self, count=None, spacing=None, closed=True, chunk=2 ** 20):
+        # count points evenly spaced by arc length along the polyline, which
+        # is closed back to its first point, or as many as spacing gives; the
+        # points are read chunk by chunk, only the arc lengths are kept whole
+        points = self.points
+        result = Curve(self.step)
+        if not len(points):
+            return result
+        # vertices of the path are the points, and the first one again if closed
+        vertices = len(points) + (1 if closed else 0)
+        steps, start, last = np.empty(vertices - 1), 0, None
+        for part in points.chunks(chunk):
+            xy = np.asarray(part.xy, dtype=float)
+            if last is not None:
+                xy = np.concatenate((last, xy))
+            steps[start:start + len(xy) - 1] = np.hypot(*np.diff(xy, axis=0).T)
+            start, last = start + len(xy) - 1, xy[-1:]
+        if closed:
+            steps[-1] = np.hypot(*(np.asarray(points.xy[0], dtype=float) - last[0]))
+        length = np.concatenate(([0], np.cumsum(steps)))
+        if count is None:
+            if spacing is None or spacing <= 0:
+                raise Exception('resample needs a count or a positive spacing')
+            count = max(int(round(length[-1] / spacing)), 1) + (0 if closed else 1)
+        t = np.linspace(0, length[-1], count, endpoint=not closed)
+        xy = np.empty((count, 2))
+        for first in range(0, count, chunk):
+            part = t[first:first + chunk]
+            # the vertices around this part of the path, interpolated as over the whole
+            lo = max(np.searchsorted(length, part[0], side='right') - 1, 0)
+            hi = min(np.searchsorted(length, part[-1], side='right') + 1, vertices)
+            path = np.asarray(points.xy[np.arange(lo, hi) % len(points)], dtype=float)
+            xy[first:first + chunk, 0] = np.interp(part, length[lo:hi], path[:, 0])
+            xy[first:first + chunk, 1] = np.interp(part, length[lo:hi], path[:, 1])
+        result.points = xy
+        return result
+
+    def filter_nearest(self, points, delta, block=32):
+        # walks from both ends towards the middle and keeps the i-th pair once
+        # both points are further than sqrt(delta) from the last kept pair;
+        # a chord is never longer than the arc, so the cumulative arc length
+        # tells how far ahead the next kept pair can be at the earliest
+        points = PointArray.from_points(points)
+        xy = points.xy
+        l_2 = int(len(xy)/2)
+        if l_2 < 2:
+            return points[[0, -1]] if len(xy) else points
+        first = xy[:l_2]
+        second = xy[(len(xy) - np.arange(l_2)) % len(xy)]
+        # the second end starts from points[-1], which is also its first candidate
+        second[0] = second[1]
+        arc1 = np.concatenate(([0], np.cumsum(np.hypot(*np.diff(first, axis=0).T))))
+        arc2 = np.concatenate(([0], np.cumsum(np.hypot(*np.diff(second, axis=0).T))))
+        reach = delta ** 0.5 * (1 - 1e-9)
+        keep = [0]
+        i = 1
+        while i < l_2:
+            j = keep[-1]
+            i = max(
+                i,
+                np.searchsorted(arc1, arc1[j] + reach, side='right'),
+                np.searchsorted(arc2, arc2[j] + reach, side='right'),
+            )
+            c1, c2 = first[i:i + block], second[i:i + block]
+            ok = (
+                (((c1 - first[j]) ** 2).sum(axis=1) > delta) &
+                (((c2 - second[j]) ** 2).sum(axis=1) > delta)
+            )
+            hits = np.flatnonzero(ok)
+            if len(hits):
+                i += hits[0]
+                keep.append(i)
+                i += 1
+            else:
+                i += block
+        r1 = first[keep]
+        r2 = np.concatenate((xy[-1:], second[keep[1:]]))
+        return PointArray(np.concatenate((r1, r2[::-1])), points.parent)
 
 class Ellipse(Curve):
 
-    def __init__(self, a, b, step, offset_x=0, offset_y=0):
+    def __init__(self, a, b, step, offset_x=0, offset_y=0, sampling='grid'):
         super(Ellipse, self).__init__(step)
         self.a, self.b = a, b
         self.offset_x, self.offset_y = offset_x, offset_y
@@ -153,8 +252,49 @@ class Ellipse(Curve):
         self.b_der_a = b / a
         self.excent = (self.b_2 / self.a_2) ** 0.5
         self.foc_par = self.b_2 / self.a
+        self.sampling = sampling
         self.points = self.get_points()
 
+    def get_points(self):
+        if self.sampling == 'grid':
+            return self.grid_points()
+        elif self.sampling == 'parametric':
+            return self.parametric_points()
+        raise Exception('Unknown sampling "{}"'.format(self.sampling))
+
+    def grid_points(self):
+        # the x grid is accumulated step by step exactly like Curve.get_points,
+        # only [offset_x - a, offset_x + a] is evaluated
+        a1, a2 = self.default_range
+        x = np.full(int((a2 - a1) / self.step) + 2, self.step)
+        x[0] = a1
+        x = np.add.accumulate(x)
+        x = x[x <= a2]
+        lo, hi = np.searchsorted(x, (self.offset_x - self.a, self.offset_x + self.a))
+        x = x[lo:hi + 1]
+        square = self.a_2 - (x - self.offset_x) ** 2
+        x = x[square >= 0]
+        pre_y = self.b_der_a * np.sqrt(square[square >= 0])
+        return PointArray.from_x_y(
+            np.concatenate((x, x)),
+            np.concatenate((pre_y + self.offset_y, -pre_y + self.offset_y)),
+            self,
+        )
+
+    def parametric_points(self, density=4):
+        # angles spaced so that neighbouring points are ~step apart along the arc
+        count = int(density * math.ceil(2 * math.pi * max(self.a, self.b) / self.step))
+        angles = np.linspace(0, 2 * math.pi, count + 1)
+        x = self.offset_x + self.a * np.cos(angles)
+        y = self.offset_y + self.b * np.sin(angles)
+        length = np.concatenate(([0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+        angles = np.interp(np.arange(0, length[-1], self.step), length, angles)
+        x = self.offset_x + self.a * np.cos(angles)
+        y = self.offset_y + self.b * np.sin(angles)
+        a1, a2 = self.default_range
+        mask = (x >= a1) & (x <= a2)
+        return PointArray.from_x_y(x[mask], y[mask], self)
+
     def y(self, x):
         pre_result = self.pre_y(x)
         if isinstance(pre_result, float):
@@ -170,31 +310,23 @@ class Ellipse(Curve):
 
 class Circle(Ellipse):
 
-    def __init__(self, r, offset_x, offset_y, step):
-        super(Circle, self).__init__(r, r, step, offset_x, offset_y)
+    def __init__(self, r, offset_x, offset_y, step, sampling='grid'):
+        super(Circle, self).__init__(r, r, step, offset_x, offset_y, sampling)
 
 
 class Oval(Curve):
 
     def __init__(self, e1, e2, center, step):
         super(Oval, self).__init__(step)
-        points = []
-        points += list(filter(
-            lambda p: (
-                p.x < e2.offset_x and
-                p.y > e2.offset_y
-            ), e2.get_points()
-        ))
-        points += list(filter(
-            lambda p: (
-                p.y >= e1.offset_y and
-                p.x >= e1.offset_x
-            ), e1.get_points()
-        ))
-        points += [p.sim(center) for p in points]
-        y_pos = list(filter(lambda p: p.y >= 0, points))
-        y_neg = list(filter(lambda p: p.y < 0, points))
-        y_pos = sorted(y_pos, key=lambda p: p.p_angle)
-        y_neg = sorted(y_neg, key=lambda p: p.p_angle, reverse=True)
+        x, y = e2.points.x, e2.points.y
+        points = e2.points.xy[(x < e2.offset_x) & (y > e2.offset_y)]
+        x, y = e1.points.x, e1.points.y
+        points = np.concatenate((points, e1.points.xy[(y >= e1.offset_y) & (x >= e1.offset_x)]))
+        points = np.concatenate((points, 2 * np.asarray([center.x, center.y]) - points))
+        y_pos = points[points[:, 1] >= 0]
+        y_neg = points[points[:, 1] < 0]
+        # same order as sorting by Point.p_angle, acos(x / r) == atan2(|y|, x)
+        y_pos = y_pos[np.argsort(np.arctan2(np.abs(y_pos[:, 1]), y_pos[:, 0]), kind='stable')]
+        y_neg = y_neg[np.argsort(-np.arctan2(np.abs(y_neg[:, 1]), y_neg[:, 0]), kind='stable')]
         y_pos, y_neg = self.filter_nearest(y_pos, self.step), self.filter_nearest(y_neg, self.step)
         self.points = y_pos + y_neg
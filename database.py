@@ -0,0 +1,136 @@
+import numpy as np
+
+from geometry import Frechet, PointArray
+
+
+class SignatureDatabase:
+    # wurf maps of reference curves by name, stored as one array of points
+    # with offsets; a query is pruned with lower bounds of the Frechet
+    # distance from coarse (w1, w2) occupancy grids and ranked by Frechet.dist
+
+    def __init__(self, bins=16, bounds=None, dtype=np.float32):
+        super(SignatureDatabase, self).__init__()
+        self.bins = bins
+        # (x_min, y_min, x_max, y_max) of the grid, from the references if None
+        self.bounds = bounds
+        self.dtype = np.dtype(dtype)
+        self.names = []
+        self.signatures = []
+        self._index = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, name):
+        return PointArray(self.signatures[self.names.index(name)].astype(float))
+
+    def add(self, name, signature):
+        xy = PointArray.from_points(signature).xy
+        if not len(xy):
+            raise Exception('Signature "{}" is empty'.format(name))
+        self.names.append(str(name))
+        self.signatures.append(xy.astype(self.dtype))
+        self._index = None
+
+    def save(self, path):
+        offsets = np.cumsum([0] + [len(s) for s in self.signatures])
+        points = np.concatenate(self.signatures) if self.signatures else np.empty((0, 2), self.dtype)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                names=np.asarray(self.names, dtype=str),
+                offsets=offsets.astype(np.int64),
+                points=points.astype(self.dtype),
+                bins=np.int64(self.bins),
+                bounds=np.asarray(self.bounds if self.bounds is not None else [np.nan] * 4, float),
+            )
+
+    @staticmethod
+    def load(path):
+        with np.load(path, allow_pickle=False) as data:
+            bounds = data['bounds']
+            result = SignatureDatabase(
+                int(data['bins']),
+                None if np.isnan(bounds).any() else tuple(bounds),
+                data['points'].dtype,
+            )
+            offsets, points = data['offsets'], data['points']
+            result.names = data['names'].tolist()
+            result.signatures = [points[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+        return result
+
+    def cells(self, xy):
+        # flat cell of every point, points outside the bounds go to the border
+        # cells, which therefore reach out to infinity
+        lo, hi = self._index['bounds']
+        cell = np.floor((xy - lo) / (hi - lo) * self.bins).astype(np.int64)
+        cell = np.clip(cell, 0, self.bins - 1)
+        return cell[:, 0] * self.bins + cell[:, 1]
+
+    def occupancy(self, xy):
+        result = np.zeros(self.bins ** 2, dtype=bool)
+        result[self.cells(xy)] = True
+        return result
+
+    def build(self):
+        if self.bounds is not None:
+            bounds = np.asarray(self.bounds, float).reshape(2, 2)
+        elif self.signatures:
+            points = np.concatenate(self.signatures).astype(float)
+            bounds = np.asarray([points.min(axis=0), points.max(axis=0)])
+        else:
+            bounds = np.asarray([[0., 0.], [1., 1.]])
+        bounds[1] = np.maximum(bounds[1], bounds[0] + 1e-9)
+        self._index = {'bounds': bounds}
+        # lower bound of the distance between any two points of two cells
+        size = (bounds[1] - bounds[0]) / self.bins
+        row, column = np.divmod(np.arange(self.bins ** 2), self.bins)
+        dx = np.maximum(np.abs(row[:, None] - row[None]) - 1, 0) * size[0]
+        dy = np.maximum(np.abs(column[:, None] - column[None]) - 1, 0) * size[1]
+        gaps = np.hypot(dx, dy)
+        occupied = np.asarray([self.occupancy(s.astype(float)) for s in self.signatures]).reshape(-1, self.bins ** 2)
+        # distance from every cell to the nearest occupied cell of a reference
+        reach = np.asarray([gaps[:, o].min(axis=1) for o in occupied]).reshape(-1, self.bins ** 2)
+        ends = np.asarray([s[[0, -1]] for s in self.signatures], float).reshape(-1, 2, 2)
+        self._index.update(gaps=gaps, occupied=occupied, reach=reach, ends=ends)
+        return self._index
+
+    def lower_bounds(self, signature):
+        # the Frechet distance is at least the Hausdorff distance of the two
+        # point sets, which is at least the one of their occupied cells, and
+        # at least the distance of the first and of the last points
+        if self._index is None:
+            self.build()
+        xy = PointArray.from_points(signature).xy
+        index = self._index
+        if not len(index['occupied']):
+            return np.zeros(0)
+        occupied = self.occupancy(xy)
+        near = index['gaps'][occupied].min(axis=0)
+        forward = index['reach'][:, occupied].max(axis=1)
+        backward = np.where(index['occupied'], near, 0).max(axis=1)
+        ends = np.hypot(*np.moveaxis(index['ends'] - xy[[0, -1]], -1, 0)).max(axis=1)
+        return np.maximum(np.maximum(forward, backward), ends)
+
+    def query(self, signature, k=1, eps=np.inf, band=None):
+        # the k nearest references within eps as (name, distance), nearest
+        # first; candidates are visited by lower bound, so the scan stops at
+        # the first one that cannot beat the k-th distance found so far
+        xy = PointArray.from_points(signature).xy
+        if not len(xy) or not len(self):
+            return []
+        bounds = self.lower_bounds(xy)
+        result = []
+        for i in np.argsort(bounds, kind='stable'):
+            limit = result[k - 1][1] if len(result) >= k else eps
+            if bounds[i] > limit:
+                break
+            reference = self.signatures[i].astype(float)
+            if len(result) >= k and not Frechet.within(xy, reference, limit):
+                continue
+            distance = Frechet.dist(xy, reference, band)
+            if distance <= limit:
+                result.append((self.names[i], distance))
+                result.sort(key=lambda item: item[1])
+                del result[k:]
+        return result
@@ -1,8 +1,14 @@
 import math
+import multiprocessing
+from multiprocessing import shared_memory
 import numpy as np
 
+import instrument
+
 class Point:
 
+    __slots__ = ('x', 'y', 'parent')
+
     def __init__(self, x, y, parent=None):
         self.x, self.y = x, y
         self.parent = parent
@@ -29,6 +35,71 @@ class Point:
         return Point(radius * math.cos(angle), radius * math.sin(angle))
 
 
+class PointArray:
+
+    __slots__ = ('xy', 'parent')
+
+    def __init__(self, xy=(), parent=None):
+        # float32 points are kept as they are (compact curves), anything else
+        # becomes float64; arrays and memory maps are not copied
+        xy = np.asarray(xy)
+        if xy.dtype != np.float32:
+            xy = xy.astype(float, copy=False)
+        self.xy = xy.reshape(-1, 2)
+        self.parent = parent
+
+    def __len__(self):
+        return len(self.xy)
+
+    def __iter__(self):
+        for x, y in self.xy.tolist():
+            yield Point(x, y, self.parent)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            x, y = self.xy[item].tolist()
+            return Point(x, y, self.parent)
+        return PointArray(self.xy[item], self.parent)
+
+    def __add__(self, other):
+        other = PointArray.from_points(other)
+        return PointArray(np.concatenate((self.xy, other.xy)), self.parent)
+
+    def __str__(self):
+        return "[{}]".format(", ".join(str(p) for p in self))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def chunks(self, size=2 ** 20):
+        for start in range(0, len(self.xy), size):
+            yield PointArray(self.xy[start:start + size], self.parent)
+
+    @property
+    def x(self):
+        return self.xy[:, 0]
+
+    @property
+    def y(self):
+        return self.xy[:, 1]
+
+    @staticmethod
+    def from_x_y(x, y, parent=None):
+        return PointArray(np.column_stack((x, y)), parent)
+
+    @staticmethod
+    def from_points(points, parent=None):
+        if isinstance(points, PointArray):
+            return points
+        if isinstance(points, np.ndarray):
+            return PointArray(points, parent)
+        points = list(points)
+        xy = [(p.x, p.y) for p in points]
+        if parent is None and points:
+            parent = points[0].parent
+        return PointArray(xy, parent)
+
+
 class Segment:
 
     def __init__(self, p1, p2):
@@ -90,6 +161,208 @@ class Segment:
         return Point((self.p1.x + self.p2.x) / 2, (self.p1.y + self.p2.y) / 2)
 
 
+class SegmentGrid:
+
+    def __init__(self, points, closed=True, cells=None):
+        xy = np.asarray(PointArray.from_points(points).xy, dtype=float)
+        if closed:
+            self.p1, self.p2 = xy, np.roll(xy, -1, axis=0)
+        else:
+            self.p1, self.p2 = xy[:-1], xy[1:]
+        count = len(self.p1)
+        if cells is None:
+            cells = max(1, int(count ** 0.5))
+        self.lo = xy.min(axis=0) if count else np.zeros(2)
+        hi = xy.max(axis=0) if count else np.zeros(2)
+        self.cell = max((hi - self.lo).max() / cells, np.finfo(float).tiny)
+        # a segment goes into every cell its box, grown by half a cell, touches
+        self.margin = self.cell / 2
+        self.shape = (np.floor((hi - self.lo) / self.cell).astype(int) + 1)
+        c0 = self.cell_of(np.minimum(self.p1, self.p2) - self.margin)
+        c1 = self.cell_of(np.maximum(self.p1, self.p2) + self.margin)
+        width = c1[:, 1] - c0[:, 1] + 1
+        counts = (c1[:, 0] - c0[:, 0] + 1) * width
+        segments, local = self._expand(counts)
+        width = width[segments]
+        cells = (
+            (c0[segments, 0] + local // width) * self.shape[1] +
+            c0[segments, 1] + local % width
+        )
+        order = np.argsort(cells, kind='stable')
+        self.segments = segments[order]
+        self.offsets = np.searchsorted(cells[order], np.arange(self.shape.prod() + 1))
+
+    def __len__(self):
+        return len(self.p1)
+
+    @staticmethod
+    def _expand(counts):
+        # (owner, position) for every item of a ragged array with given counts
+        owners = np.repeat(np.arange(len(counts)), counts)
+        starts = np.cumsum(counts) - counts
+        return owners, np.arange(len(owners)) - starts[owners]
+
+    @staticmethod
+    def _unique(keys):
+        keys = np.sort(keys)
+        return keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+    def cell_of(self, xy):
+        cell = np.floor((xy - self.lo) / self.cell).astype(int)
+        return np.clip(cell, 0, self.shape - 1)
+
+    def cross_lines(self, origins, directions, chunk=2 ** 16):
+        # for every line origin + t * direction returns its first and last
+        # crossing with the polyline, ordered by t, and the number of crossings;
+        # the lines go in groups of about chunk visited cells, which bounds
+        # the memory whatever the number of lines
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        directions = np.asarray(directions, dtype=float).reshape(-1, 2)
+        lines = len(origins)
+        result = np.full((lines, 2, 2), np.nan)
+        count = np.zeros(lines, dtype=int)
+        if not lines or not len(self):
+            return result, count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            directions = directions / np.hypot(*directions.T)[:, None]
+            # the part of every line inside the grid
+            lo = (self.lo - self.margin - origins) / directions
+            hi = (self.lo + self.shape * self.cell + self.margin - origins) / directions
+        inside = (origins >= self.lo - self.margin) & (origins <= self.lo + self.shape * self.cell + self.margin)
+        flat = directions == 0
+        lo[flat] = np.where(inside[flat], -np.inf, np.inf)
+        hi[flat] = np.where(inside[flat], np.inf, -np.inf)
+        t0 = np.minimum(lo, hi).max(axis=1)
+        t1 = np.maximum(lo, hi).min(axis=1)
+        valid = (t0 <= t1) & np.isfinite(directions).all(axis=1)
+        # a walk with half a cell step visits this many cells
+        steps = np.where(valid, np.floor((t1 - t0) / (self.cell / 2)).astype(int) + 2, 0)
+        total = np.cumsum(steps)
+        first = 0
+        while first < lines:
+            last = max(int(np.searchsorted(total, total[first] - steps[first] + chunk, side='right')), first + 1)
+            group = slice(first, last)
+            result[group], count[group] = self._cross_group(origins[group], directions[group], t0[group], t1[group], steps[group])
+            first = last
+        if instrument.active is not None:
+            instrument.count('cross_lines.lines', lines)
+        return result, count
+
+    def _cross_group(self, origins, directions, t0, t1, steps):
+        lines = len(origins)
+        result = np.full((lines, 2, 2), np.nan)
+
+        # walk every line and keep the visited cells that hold segments
+        line, local = self._expand(steps)
+        t = np.minimum(t0[line] + local * (self.cell / 2), t1[line])
+        cell = self.cell_of(origins[line] + t[:, None] * directions[line])
+        cell = cell[:, 0] * self.shape[1] + cell[:, 1]
+        occupied = self.offsets[cell + 1] > self.offsets[cell]
+        pairs = self._unique(line[occupied] * self.shape.prod() + cell[occupied])
+        line, cell = pairs // self.shape.prod(), pairs % self.shape.prod()
+
+        # candidate segments of the visited cells
+        counts = self.offsets[cell + 1] - self.offsets[cell]
+        owner, local = self._expand(counts)
+        segment = self.segments[self.offsets[cell[owner]] + local]
+        pairs = self._unique(line[owner] * len(self) + segment)
+        line, segment = pairs // len(self), pairs % len(self)
+
+        o, d = origins[line], directions[line]
+        p1, p2 = self.p1[segment], self.p2[segment]
+        s1 = d[:, 0] * (p1[:, 1] - o[:, 1]) - d[:, 1] * (p1[:, 0] - o[:, 0])
+        s2 = d[:, 0] * (p2[:, 1] - o[:, 1]) - d[:, 1] * (p2[:, 0] - o[:, 0])
+        crossed = (s1 > 0) != (s2 > 0)
+        if instrument.active is not None:
+            instrument.count('cross_lines.candidates', len(crossed))
+        line, p1, p2 = line[crossed], p1[crossed], p2[crossed]
+        u = s1[crossed] / (s1[crossed] - s2[crossed])
+        points = p1 + u[:, None] * (p2 - p1)
+        t = ((points - origins[line]) * directions[line]).sum(axis=1)
+        order = np.lexsort((t, line))
+        line, points = line[order], points[order]
+        count = np.bincount(line, minlength=lines)
+        found = count > 0
+        last = np.cumsum(count) - 1
+        result[found, 0] = points[last[found] - count[found] + 1]
+        result[found, 1] = points[last[found]]
+        return result, count
+
+
+class PointGrid:
+
+    def __init__(self, points, cell=None):
+        self.xy = np.asarray(PointArray.from_points(points).xy, dtype=float)
+        self.lo = self.xy.min(axis=0) if len(self.xy) else np.zeros(2)
+        hi = self.xy.max(axis=0) if len(self.xy) else np.zeros(2)
+        if cell is None:
+            # about one point per cell, and no more cells along the longer
+            # side than points, which keeps collinear points in a row of cells
+            count = max(len(self.xy), 1)
+            cell = max(((hi - self.lo).prod() / count) ** 0.5, (hi - self.lo).max() / count)
+        # a single cell when every point is the same
+        self.cell = cell = max(cell, (hi - self.lo).max() / 2 ** 20) or 1.0
+        self.shape = np.floor((hi - self.lo) / cell).astype(int) + 1
+        keys = self.key(self.cell_of(self.xy))
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.xy)
+
+    def cell_of(self, xy):
+        # clipped far beyond the grid, so that distant queries do not overflow
+        return np.clip(np.floor((xy - self.lo) / self.cell), -2 ** 40, 2 ** 40).astype(int)
+
+    def key(self, cell):
+        inside = ((cell >= 0) & (cell < self.shape)).all(axis=-1)
+        return np.where(inside, cell[..., 0] * self.shape[1] + cell[..., 1], -1)
+
+    def radius_pairs(self, xy, radius):
+        # (query, point, distance) for every indexed point within radius of xy
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        # the cells within reach of every query, clipped to the grid
+        reach = int(min(np.ceil(radius / self.cell), 2 ** 40))
+        cell = self.cell_of(xy)
+        lo = np.clip(cell - reach, 0, self.shape)
+        width = np.clip(cell + reach + 1, 0, self.shape) - lo
+        owner, local = SegmentGrid._expand(width.prod(axis=1))
+        height = width[owner, 1]
+        keys = (lo[owner, 0] + local // height) * self.shape[1] + lo[owner, 1] + local % height
+        start = np.searchsorted(self.keys, keys, side='left')
+        counts = np.searchsorted(self.keys, keys, side='right') - start
+        cells, local = SegmentGrid._expand(counts)
+        query = owner[cells]
+        point = self.order[start[cells] + local]
+        dist = np.hypot(*(self.xy[point] - xy[query]).T)
+        close = dist <= radius
+        return query[close], point[close], dist[close]
+
+    def nearest(self, xy, k=1, radius=np.inf):
+        # distances and indices of the k nearest points within radius,
+        # inf and -1 where there are fewer of them; the search radius
+        # doubles only for the queries that are not settled yet
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        distances = np.full((len(xy), k), np.inf)
+        indices = np.full((len(xy), k), -1)
+        todo = np.arange(len(xy))
+        current = min(self.cell, radius)
+        extent = np.hypot(*(self.shape * self.cell))
+        while len(todo):
+            query, point, dist = self.radius_pairs(xy[todo], current)
+            order = np.lexsort((dist, query))
+            query, point, dist = query[order], point[order], dist[order]
+            rank = np.arange(len(query)) - np.searchsorted(query, query)
+            keep = rank < k
+            distances[todo[query[keep]], rank[keep]] = dist[keep]
+            indices[todo[query[keep]], rank[keep]] = point[keep]
+            if current >= min(radius, extent + np.hypot(*(xy[todo] - self.lo).T).max()):
+                break
+            todo = todo[distances[todo, -1] > current]
+            current = min(2 * current, radius)
+        return distances, indices
+
+
 class Projection:
 
     def __init__(self, a1, a2, a3, b1, b2, b3, c1, c2):
@@ -97,44 +370,251 @@ class Projection:
         self.b1, self.b2, self.b3 = b1, b2, b3
         self.c1, self.c2 = c1, c2
 
+    def __matmul__(self, other):
+        return self.compose(other)
+
+    @property
+    def matrix(self):
+        # maps homogeneous (x, y, 1) columns
+        return np.asarray([
+            [self.a1, self.a2, self.a3],
+            [self.b1, self.b2, self.b3],
+            [self.c1, self.c2, 1],
+        ], dtype=float)
+
+    @staticmethod
+    def from_matrix(matrix):
+        matrix = np.asarray(matrix, dtype=float)
+        if matrix.shape != (3, 3):
+            raise Exception('A projection matrix must be 3x3, got {}'.format(matrix.shape))
+        if matrix[2, 2] == 0:
+            raise Exception('A projection matrix needs m[2][2] != 0')
+        (a1, a2, a3), (b1, b2, b3), (c1, c2, c3) = (matrix / matrix[2, 2]).tolist()
+        return Projection(a1, a2, a3, b1, b2, b3, c1, c2)
+
+    def compose(self, other):
+        # self after other
+        return Projection.from_matrix(self.matrix @ other.matrix)
+
+    def inverse(self):
+        return Projection.from_matrix(np.linalg.inv(self.matrix))
+
     def mapper(self, p):
+        w = self.c1 * p.x + self.c2 * p.y + 1
         return Point(
-            (self.a1 * p.x + self.a2 * p.y + self.a3) / (self.c1 * p.x + self.c2 * p.y + 1),
-            (self.b1 * p.x + self.b2 * p.y + self.b3) / (self.c1 * p.x + self.c2 * p.y + 1),
+            (self.a1 * p.x + self.a2 * p.y + self.a3) / w,
+            (self.b1 * p.x + self.b2 * p.y + self.b3) / w,
             p.parent,
         )
 
-    def transform(self, points):
-        return map(self.mapper, points)
+    @staticmethod
+    def apply(matrices, xy):
+        # (..., 3, 3) matrices applied to (N, 2) points give (..., N, 2)
+        matrices = np.asarray(matrices, dtype=float)
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        h = xy @ np.swapaxes(matrices[..., :, :2], -1, -2) + matrices[..., None, :, 2]
+        return h[..., :2] / h[..., 2:]
+
+    @staticmethod
+    def stack(projections):
+        return np.asarray([p.matrix for p in projections]).reshape(-1, 3, 3)
+
+    def transform(self, points, chunk=2 ** 20):
+        # chunk by chunk, so that a memory mapped curve is read once and its
+        # float64 temporaries stay small
+        points = PointArray.from_points(points)
+        result = np.empty((len(points), 2))
+        start = 0
+        for part in points.chunks(chunk):
+            result[start:start + len(part)] = Projection.apply(self.matrix, part.xy)
+            start += len(part)
+        return PointArray(result, points.parent)
+
+    @staticmethod
+    def transform_many(projections, points):
+        # every projection applied to the same points at once, (M, N, 2)
+        return Projection.apply(Projection.stack(projections), PointArray.from_points(points).xy)
 
 class Frechet():
     # http://www.kr.tuwien.ac.at/staff/eiter/et-archive/cdtr9464.pdf
     @staticmethod
-    def _c(ca, i, j, P, Q):
-        if ca[i, j] > -1:
-            return ca[i, j]
-        elif i == 0 and j == 0:
-            ca[i, j] = Segment(P[0], Q[0]).len
-
-        elif i > 0 and j == 0:
-            ca[i, j] = max(Frechet._c(ca, i - 1, 0, P, Q), Segment(P[i], Q[0]).len)
-        elif i == 0 and j > 0:
-            ca[i, j] = max(Frechet._c(ca, 0, j - 1, P, Q), Segment(P[0], Q[j]).len)
-        elif i > 0 and j > 0:
-            ca[i, j] = max(
-                min(
-                    Frechet._c(ca, i - 1, j, P, Q),
-                    Frechet._c(ca, i - 1, j - 1, P, Q),
-                    Frechet._c(ca, i, j - 1, P, Q),
-                ),
-                Segment(P[i], Q[j]).len
-            )
-        else:
-            ca[i, j] = float("inf")
-        return ca[i, j]
+    def dist(P, Q, band=None):
+        # bottom-up over the anti-diagonals i + j = s of the coupling matrix,
+        # band limits |i * (m - 1) / (n - 1) - j| like a Sakoe-Chiba band;
+        # its edges are found in exact arithmetic, rounding the float ratio
+        # lost the cells that lie right on them
+        P, Q = (np.asarray(PointArray.from_points(c).xy, dtype=float) for c in (P, Q))
+        if len(P) < len(Q):
+            P, Q = Q, P
+        n, m = len(P), len(Q)
+        if not m:
+            return float("inf")
+        # P is reversed so that every diagonal is a slice of both arrays,
+        # the recurrence runs on squared distances and takes the root once
+        px, py = P[::-1, 0].copy(), P[::-1, 1].copy()
+        qx, qy = Q[:, 0].copy(), Q[:, 1].copy()
+        if band is not None and band < 0:
+            return float("inf")
+        if band is not None and (n == 1 or math.isinf(band)):
+            band = None
+        if band is not None:
+            # i = s - j, so the band is |s * (m - 1) - j * span| <= band * (n - 1),
+            # all integers once that width is written as width / denominator
+            width, denominator = float(band * (n - 1)).as_integer_ratio()
+            slope, span = (m - 1) * denominator, (n + m - 2) * denominator
+        # ca[i, j] of a diagonal is kept at j + 1, the rest stays inf
+        before, previous, current = (np.full(m + 2, np.inf) for i in range(3))
+        last, empty = None, False
+        for s in range(n + m - 1):
+            lo, hi = max(0, s - n + 1), min(s, m - 1)
+            if band is not None:
+                lo = max(lo, -((width - s * slope) // span))
+                hi = min(hi, (s * slope + width) // span)
+            if lo > hi:
+                # a path can step over one diagonal but not two; the next two
+                # read at most 3 cells past the last diagonal, which is reset
+                if empty:
+                    return float("inf")
+                empty = True
+                current[last[0]:last[1] + 4] = np.inf
+                before, previous, current = previous, current, before
+                continue
+            last, empty = (lo, hi), False
+            k = n - 1 - s
+            d = (px[k + lo:k + hi + 1] - qx[lo:hi + 1]) ** 2
+            d += (py[k + lo:k + hi + 1] - qy[lo:hi + 1]) ** 2
+            if s == 0:
+                current[1] = d[0]
+            else:
+                value = np.minimum(previous[lo + 1:hi + 2], previous[lo:hi + 1])
+                np.minimum(value, before[lo:hi + 1], out=value)
+                np.maximum(value, d, out=current[lo + 1:hi + 2])
+            current[lo] = current[hi + 2] = np.inf
+            before, previous, current = previous, current, before
+        return math.sqrt(previous[m])
 
     @staticmethod
-    def dist(P, Q):
-        ca = np.ones((len(P), len(Q)))
-        ca = np.multiply(ca, -1)
-        return Frechet._c(ca, len(P) - 1, len(Q) - 1, P, Q)
+    def within(P, Q, eps):
+        # decides dist(P, Q) <= eps: lower bounds first, then reachability
+        # of the free space row by row, given up once a row is blocked
+        P, Q = (np.asarray(PointArray.from_points(c).xy, dtype=float) for c in (P, Q))
+        if not len(P) or not len(Q):
+            return False
+        # same rounding as dist, so that within(P, Q, dist(P, Q)) holds; the
+        # lower bounds below only prune, they get a little slack for hypot
+        norm = lambda d: np.sqrt((d ** 2).sum(axis=-1))
+        slack = eps * (1 + 1e-9)
+        # the endpoints are always coupled
+        if norm(P[0] - Q[0]) > eps or norm(P[-1] - Q[-1]) > eps:
+            return False
+        # every point needs a point of the other curve within eps, so it has
+        # to be within eps of its bounding box first
+        for A, B in ((P, Q), (Q, P)):
+            gap = np.maximum(np.maximum(B.min(axis=0) - A, A - B.max(axis=0)), 0)
+            if (np.hypot(*gap.T) > slack).any():
+                return False
+        for A, B in ((P, Q), (Q, P)):
+            distances, indices = PointGrid(B, slack).nearest(A, 1, slack)
+            if np.isinf(distances[:, 0]).any():
+                return False
+        if len(P) > len(Q):
+            P, Q = Q, P
+        m = len(Q)
+        qx, qy = Q[:, 0].copy(), Q[:, 1].copy()
+        free = lambda p, start, stop: np.sqrt(
+            (qx[start:stop] - p[0]) ** 2 + (qy[start:stop] - p[1]) ** 2
+        ) <= eps
+        # the reachable cells of the previous row are reach, starting at lo;
+        # (-1, -1) is taken as reachable to start the first row
+        lo, reach = 0, np.ones(0, dtype=bool)
+        for i, p in enumerate(P):
+            stop = min(lo + len(reach) + 1, m)
+            current = free(p, lo, stop)
+            seed = np.zeros(stop - lo, dtype=bool)
+            seed[:len(reach)] |= reach[:stop - lo]
+            seed[1:len(reach) + 1] |= reach[:stop - lo - 1]
+            if i == 0:
+                seed[0] = True
+            seed &= current
+            # a seed carries on to the right until its free run ends
+            index = np.arange(stop - lo)
+            blocked = np.maximum.accumulate(np.where(current, -1, index))
+            seeded = np.maximum.accumulate(np.where(seed, index, -1))
+            current &= seeded > blocked
+            while len(current) and current[-1] and stop < m:
+                start, stop = stop, min(m, stop + max(64, stop - lo))
+                current = np.concatenate((current, np.logical_and.accumulate(free(p, start, stop))))
+            found = np.flatnonzero(current)
+            if not len(found):
+                return False
+            lo, reach = lo + found[0], current[found[0]:found[-1] + 1]
+        return lo + len(reach) == m
+
+    @staticmethod
+    def pairwise(signatures, workers=None, band=None, chunk=16):
+        result = np.full((len(signatures), len(signatures)), np.nan)
+        for pairs, values in Frechet.pairwise_iter(signatures, workers, band, chunk, result):
+            pass
+        return result
+
+    @staticmethod
+    def pairwise_iter(signatures, workers=None, band=None, chunk=16, out=None):
+        # yields (pairs, distances) chunks of the upper triangle as they are
+        # done and fills both halves of out on the way, so a partial matrix
+        # can be used early; the signatures go to the workers once, through
+        # shared memory, and the tasks only carry index pairs
+        signatures = [np.asarray(PointArray.from_points(s).xy, dtype=float) for s in signatures]
+        count = len(signatures)
+        if out is None:
+            out = np.full((count, count), np.nan)
+        out[np.diag_indices(count)] = 0
+        offsets = np.concatenate(([0], np.cumsum([len(s) for s in signatures]))).astype(np.int64)
+        xy = np.concatenate(signatures) if count else np.empty((0, 2))
+        pairs = np.column_stack(np.triu_indices(count, 1))
+        # the most expensive pairs first, so that no worker is left with a big
+        # one at the end
+        sizes = np.diff(offsets)
+        pairs = pairs[np.argsort(-(sizes[pairs[:, 0]] * sizes[pairs[:, 1]]), kind='stable')]
+        tasks = [pairs[k:k + chunk] for k in range(0, len(pairs), chunk)]
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if workers <= 1 or len(tasks) <= 1:
+            results = (_pairwise_chunk(task, xy, offsets, band) for task in tasks)
+            for pairs, values in results:
+                out[pairs[:, 0], pairs[:, 1]] = out[pairs[:, 1], pairs[:, 0]] = values
+                yield pairs, values
+            return
+        memory = shared_memory.SharedMemory(create=True, size=max(xy.nbytes, 1))
+        try:
+            shared = np.ndarray(xy.shape, buffer=memory.buf)
+            shared[:] = xy
+            del shared
+            workers = min(workers, len(tasks))
+            with multiprocessing.Pool(workers, _attach, (memory.name, xy.shape, offsets, band)) as pool:
+                for pairs, values in pool.imap_unordered(_pairwise_chunk, tasks):
+                    out[pairs[:, 0], pairs[:, 1]] = out[pairs[:, 1], pairs[:, 0]] = values
+                    yield pairs, values
+        finally:
+            memory.close()
+            memory.unlink()
+
+
+# signatures of Frechet.pairwise_iter, attached once in every worker process
+_shared = {}
+
+
+def _attach(name, shape, offsets, band):
+    memory = shared_memory.SharedMemory(name=name)
+    _shared.update(
+        memory=memory, xy=np.ndarray(shape, buffer=memory.buf),
+        offsets=offsets, band=band,
+    )
+
+
+def _pairwise_chunk(pairs, xy=None, offsets=None, band=None):
+    if xy is None:
+        xy, offsets, band = _shared['xy'], _shared['offsets'], _shared['band']
+    return pairs, np.asarray([
+        Frechet.dist(xy[offsets[i]:offsets[i + 1]], xy[offsets[j]:offsets[j + 1]], band)
+        for i, j in pairs
+    ], dtype=float)
@@ -0,0 +1,257 @@
+import numpy as np
+
+from curves import Curve
+from geometry import PointArray, PointGrid, Segment
+from main import Helper
+from wurf import last_points
+import instrument
+
+
+class IncrementalSignature:
+    # Helper.pipeline for a contour that changes a little at a time: the conic
+    # of every window, the chords, the inner curves, the tangents, the wurf
+    # map and its filter are kept per point, and update(start, stop, points)
+    # replaces points[start:stop] recomputing only the windows, chords,
+    # tangents and wurf points the edit reaches, by index or by a line through
+    # a changed segment. Chords pair point i with i + n / 2, so an edit that
+    # changes the point count, or one that moves the cross point, recomputes
+    # everything from the chords on; the conics stay local either way. The
+    # grids of the oval, the second inner curve and the wurf map are rebuilt
+    # on every update, they cost little next to the crossings they serve
+
+    def __init__(self, points, step, wurfs=(2, 1.5), delta=0.01):
+        super(IncrementalSignature, self).__init__()
+        if len(wurfs) != 2:
+            raise Exception('Two wurfs are needed, got {}'.format(len(wurfs)))
+        self.wurfs = np.asarray(wurfs, dtype=float)
+        self.delta = delta
+        self.curve = Curve.from_points(np.array(PointArray.from_points(points).xy, dtype=float), step)
+        with instrument.stage('incremental.values'):
+            self.values = Helper.calculate(self.curve.points)
+            self.plateau = Helper.conjugation_mask(self.values)
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.curve.points)
+
+    @property
+    def inner_curves(self):
+        return [PointArray(p[v]) for p, v in zip(self.p3, self.inner)]
+
+    @property
+    def wurf_map(self):
+        return PointArray(self.wurf[self.mapped])
+
+    @property
+    def signature(self):
+        return PointArray(self.wurf[self.mapped & self.keep])
+
+    def append(self, points):
+        # a recompute from the chords on like any change of the point count:
+        # every chord pairs point i with i + n / 2, which moves for all of them
+        self.update(len(self), len(self), points)
+
+    def update(self, start, stop, points):
+        # replaces points[start:stop] by points, which may be more or fewer
+        points = np.asarray(PointArray.from_points(points).xy, dtype=float)
+        old = self.curve.points.xy
+        n, k = len(old), len(points)
+        if not 0 <= start <= stop <= n:
+            raise Exception('Bad range {}:{} of {} points'.format(start, stop, n))
+        xy = np.concatenate((old[:start], points, old[stop:]))
+        curve = Curve.from_points(xy, self.curve.step)
+        with instrument.stage('incremental.values'):
+            # the windows around the new points, then the plateau test
+            # wherever it reads one of their values; nothing is kept if the
+            # conjugation points are lost
+            centers = self.around(start - 2, start + k + 2, len(xy))
+            values = self.splice(self.values.copy(), start, stop, k)
+            values[centers] = Helper.fit_conics(xy, centers)
+            instrument.count('incremental.windows', len(centers))
+            centers = self.around(start - 6, start + k + 6, len(xy))
+            plateau = self.splice(self.plateau.copy(), start, stop, k)
+            plateau[centers] = Helper.conjugation_mask(values, centers=centers)
+        conjugation_points, cross_point = self.conjugation(curve, plateau)
+        self.curve, self.values, self.plateau = curve, values, plateau
+        if len(xy) != n or (cross_point.x, cross_point.y) != (self.cross_point.x, self.cross_point.y):
+            return self.rebuild()
+        self.conjugation_points = conjugation_points
+        if not k:
+            return
+
+        # the chords through a new point, and the lines through a changed
+        # segment of the oval, old or new
+        touched = np.zeros(n, dtype=bool)
+        touched[start:stop] = True
+        i = np.arange(n)
+        opposite = np.where(i + n // 2 >= n, i - n // 2, i + n // 2)
+        chords = touched | touched[opposite]
+        edge = np.arange(start - 1, stop + 1) % n
+        boxes = [self.box(old[edge], xy[edge])]
+        others = np.flatnonzero(~chords)
+        origins = xy[opposite[others]]
+        chords[others[self.crosses(origins, xy[others] - origins, boxes)]] = True
+        self.refresh(np.flatnonzero(chords), boxes)
+
+    def rebuild(self):
+        # everything from the chords on, as if all of them had changed
+        n = len(self)
+        self.conjugation_points, self.cross_point = self.conjugation(self.curve, self.plateau)
+        self.crossing, self.found = np.full((n, 2, 2), np.nan), np.zeros(n, dtype=bool)
+        self.p3, self.valid = np.full((2, n, 2), np.nan), np.zeros((2, n), dtype=bool)
+        self.inner = self.valid.copy()
+        self.directions, self.wurf = np.full((n, 2), np.nan), np.full((n, 2), np.nan)
+        self.mapped, self.keep = np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+        self.neighbour = np.full(n, -1)
+        instrument.count('incremental.rebuilds')
+        self.refresh(np.arange(n), [], full=True)
+
+    @staticmethod
+    def conjugation(curve, plateau):
+        indices = Helper.plateau_indices(plateau)
+        if len(indices) < 4:
+            raise Exception('Found only {} conjugation points'.format(len(indices)))
+        if len(indices) > 4:
+            indices = Helper.best_four(indices)
+        points = curve.points[indices]
+        return points, Segment.cross(Segment(points[0], points[2]), Segment(points[1], points[3]))
+
+    def refresh(self, chords, boxes, full=False):
+        # recomputes the given chords; boxes hold the changed segments of the
+        # oval, full skips the tests of what else the changes reach
+        n = len(self)
+        with instrument.stage('incremental.chords'):
+            crossing, found = Helper.chords(self.curve, indices=chords)
+            p3, valid = last_points(
+                crossing[:, 0], (self.cross_point.x, self.cross_point.y), crossing[:, 1],
+                self.wurfs[:, None],
+            )
+            inner = valid & found
+            # the inner points that moved, appeared or went away
+            changed = (inner != self.inner[:, chords]) | (inner & (p3 != self.p3[:, chords]).any(axis=-1))
+            old_second, old_positions = self.p3[1][self.inner[1]], self.positions(self.inner[1])
+            self.crossing[chords], self.found[chords] = crossing, found
+            self.p3[:, chords], self.valid[:, chords], self.inner[:, chords] = p3, valid, inner
+            instrument.count('incremental.chords', len(chords))
+
+        with instrument.stage('incremental.wurf'):
+            first, second = [Curve.from_points(p[v], self.curve.step) for p, v in zip(self.p3, self.inner)]
+            positions = self.positions(self.inner[0])
+            order = np.flatnonzero(self.inner[0])
+            # the tangents whose window of five reaches a changed point
+            redo = np.zeros(n, dtype=bool)
+            near = positions[chords[changed[0]]][:, None] + np.arange(-2, 3)
+            if len(order):
+                redo[order[near.ravel() % len(order)]] = True
+            if not full:
+                # and the ones through a changed segment of either curve
+                new_positions = self.positions(self.inner[1])
+                for a, b in self.runs(chords[changed[1]]):
+                    boxes = boxes + [self.box(
+                        self.stretch(old_second, old_positions[a] - 1, old_positions[b + 1]),
+                        self.stretch(second.points.xy, new_positions[a] - 1, new_positions[b + 1]),
+                    )]
+                others = np.flatnonzero(self.inner[0] & ~redo)
+                hit = self.crosses(first.points.xy[positions[others]], self.directions[others], boxes)
+                redo[others[hit]] = True
+            redo = np.flatnonzero(redo)
+            self.directions[redo] = Helper.tangents(first.points, positions[redo])
+            result, found = Helper.wurf_signature(first, second, self.curve, positions[redo])
+            mapped = self.mapped.copy()
+            mapped[redo] = found
+            mapped &= self.inner[0]
+            instrument.count('incremental.tangents', len(redo))
+
+        with instrument.stage('incremental.filter'):
+            # filter_outliers keeps a point while some other point is within
+            # the radius, the neighbour that showed it is kept too; tested
+            # again are the points that moved, the kept ones whose neighbour
+            # moved, and the dropped ones a moved point comes near
+            moved = np.zeros(n, dtype=bool)
+            moved[redo] = True
+            moved |= mapped != self.mapped
+            self.wurf[redo] = result
+            self.mapped = mapped
+            radius = self.delta ** 0.5
+            index = np.flatnonzero(mapped)
+            grid = PointGrid(self.wurf[index])
+            if full:
+                again = index
+            else:
+                again = moved & mapped
+                lost = np.flatnonzero(self.keep & mapped)
+                again[lost[moved[self.neighbour[lost]]]] = True
+                query, point, dist = grid.radius_pairs(self.wurf[moved & mapped], radius * (1 + 1e-9))
+                near = np.zeros(n, dtype=bool)
+                near[index[point]] = True
+                again = np.flatnonzero(again | (near & mapped & ~self.keep))
+            distances, indices = grid.nearest(self.wurf[again], 2, radius)
+            # the point itself comes second after a duplicate of it
+            other = np.where(indices[:, 1] == np.searchsorted(index, again), indices[:, 0], indices[:, 1])
+            self.keep[again] = distances[:, 1] ** 2 < self.delta
+            self.neighbour[again] = np.where(other >= 0, index[other], -1)
+            self.keep &= mapped
+            instrument.count('incremental.filtered', len(again))
+
+    @staticmethod
+    def around(lo, hi, length):
+        return np.unique(np.arange(lo, hi) % length)
+
+    @staticmethod
+    def splice(array, start, stop, count):
+        # array[start:stop] replaced by count undefined items, in place when
+        # the length stays
+        if count == stop - start:
+            return array
+        middle = np.zeros((count,) + array.shape[1:], dtype=array.dtype)
+        return np.concatenate((array[:start], middle, array[stop:]))
+
+    @staticmethod
+    def positions(mask):
+        # index into the compacted points of every chord, n + 1 of them: the
+        # first position at or after the chord
+        return np.concatenate(([0], np.cumsum(mask)))
+
+    @staticmethod
+    def runs(indices):
+        # (first, last) of the runs of consecutive sorted indices, merged into
+        # one when there are many
+        if not len(indices):
+            return []
+        breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+        if len(breaks) >= 16:
+            return [(indices[0], indices[-1])]
+        return [(run[0], run[-1]) for run in np.split(indices, breaks)]
+
+    @staticmethod
+    def stretch(xy, first, last):
+        # points first to last of a closed curve, which may have none
+        if not len(xy):
+            return xy
+        return xy[np.arange(first, last + 1) % len(xy)]
+
+    @staticmethod
+    def box(*points):
+        # bounding box of the points, grown by the rounding of the crossings
+        points = np.concatenate(points)
+        if not len(points):
+            return None
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        eps = 1e-9 * (1 + np.abs(points).max())
+        return lo - eps, hi + eps
+
+    @staticmethod
+    def crosses(origins, directions, boxes):
+        # lines origin + t * direction through any of the boxes
+        result = np.zeros(len(origins), dtype=bool)
+        for box in boxes:
+            if box is None:
+                continue
+            lo, hi = box
+            corners = np.asarray([lo, (lo[0], hi[1]), (hi[0], lo[1]), hi])
+            side = (
+                directions[:, None, 0] * (corners[:, 1] - origins[:, None, 1]) -
+                directions[:, None, 1] * (corners[:, 0] - origins[:, None, 0])
+            )
+            result |= (side.min(axis=1) <= 0) & (side.max(axis=1) >= 0)
+        return result
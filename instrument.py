@@ -0,0 +1,123 @@
+import collections
+import contextlib
+import os
+import signal
+import threading
+import time
+
+
+# the report being recorded into, None while instrumentation is off; hooks
+# test it before they compute anything, so that off they cost one lookup
+active = None
+
+
+class Report:
+
+    def __init__(self):
+        super(Report, self).__init__()
+        self.times = collections.defaultdict(float)
+        self.calls = collections.Counter()
+        self.counters = collections.Counter()
+        self.sampler = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - started
+            self.calls[name] += 1
+
+    def count(self, name, value=1):
+        self.counters[name] += int(value)
+
+    def as_dict(self, top=30):
+        result = {
+            'stages': {
+                name: {'time': self.times[name], 'calls': self.calls[name]}
+                for name in self.times
+            },
+            'counters': dict(self.counters),
+        }
+        if self.sampler is not None:
+            result['profile'] = self.sampler.as_dict(top)
+        return result
+
+
+class Sampler:
+    # statistical profiler: every interval of CPU time the stack of the main
+    # thread is sampled, own counts the innermost line and total counts every
+    # function on the stack once; signals are handled between bytecodes, so
+    # the time of a long numpy call lands on the Python line right after it
+
+    def __init__(self, interval=0.001):
+        super(Sampler, self).__init__()
+        self.interval = interval
+        self.own = collections.Counter()
+        self.total = collections.Counter()
+        self.samples = 0
+        self.previous = None
+
+    def sample(self, signum, frame):
+        self.samples += 1
+        self.own['{}:{} {}'.format(
+            os.path.basename(frame.f_code.co_filename), frame.f_lineno, frame.f_code.co_name,
+        )] += 1
+        seen = set()
+        while frame is not None:
+            name = '{}:{}'.format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            if name not in seen:
+                seen.add(name)
+                self.total[name] += 1
+            frame = frame.f_back
+
+    def start(self):
+        if not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+            raise Exception('The sampling profiler needs signal.setitimer and the main thread')
+        self.previous = signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous or signal.SIG_DFL)
+
+    def as_dict(self, top=30):
+        share = lambda count: count / self.samples if self.samples else 0
+        return {
+            'interval': self.interval,
+            'samples': self.samples,
+            'own': [(name, count, share(count)) for name, count in self.own.most_common(top)],
+            'total': [(name, count, share(count)) for name, count in self.total.most_common(top)],
+        }
+
+
+@contextlib.contextmanager
+def recording(profile=False, interval=0.001):
+    # with recording() as report: ... collects into report; nested recordings
+    # go into the outer one
+    global active
+    if active is not None:
+        yield active
+        return
+    report = active = Report()
+    if profile:
+        report.sampler = Sampler(interval)
+        report.sampler.start()
+    try:
+        yield report
+    finally:
+        if report.sampler is not None:
+            report.sampler.stop()
+        active = None
+
+
+def stage(name):
+    if active is None:
+        return contextlib.nullcontext()
+    return active.stage(name)
+
+
+def count(name, value=1):
+    if active is not None:
+        active.count(name, value)
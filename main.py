@@ -1,16 +1,11 @@
-import sys
-sys.setrecursionlimit(10000)
-import itertools
-from functools import reduce
 from geometry import Frechet
 
 from curves import Oval, Curve, Ellipse, Circle
 import numpy as np
-import matplotlib.pyplot as plt
-from pyflann import *
 
-from geometry import Projection, Segment, Point
-from wurf import WURF
+from geometry import Projection, Segment, Point, PointArray, PointGrid
+from wurf import last_points, wurf_values
+import instrument
 
 
 class Helper:
@@ -24,10 +19,9 @@ class Helper:
         count = 5
         if len(window) != count:
             raise Exception("len(points) must be {}".format(count))
-        A = np.asarray([
-            np.asarray([p.x**2, p.y**2, p.x*p.y, p.x, p.y])
-            for p in window
-        ])
+        window = PointArray.from_points(window)
+        x, y = window.x, window.y
+        A = np.column_stack((x**2, y**2, x*y, x, y))
         B = np.asarray([1 for i in range(count)])
         # print(A)
         # print(B)
@@ -44,15 +38,80 @@ class Helper:
         return result
 
     @staticmethod
-    def calculate(points):
+    def window_indices(length, size=2, centers=None):
+        # indices of Helper.window(i, points, size) for every i in centers
+        if centers is None:
+            centers = np.arange(length)
+        return (np.asarray(centers)[:, None] + np.arange(-size, size + 1)) % length
+
+    @staticmethod
+    def fit_conics(points, centers=None, count=5, chunk=2 ** 16):
+        if count < 5 or count % 2 == 0:
+            raise Exception("count must be odd and >= 5, got {}".format(count))
+        points = PointArray.from_points(points)
+        if points.xy.dtype == np.float32:
+            # rounding to float32 moves the coefficients of closely spaced
+            # windows by far more than the delta of the plateau test
+            raise Exception('Conic fits need float64 points, got float32 (a compact curve?)')
+        if centers is None:
+            centers = np.arange(len(points))
+        if len(centers) > chunk:
+            # the systems of every window would take 25 floats a point at once
+            return np.concatenate([
+                Helper.fit_conics(points, centers[start:start + chunk], count, chunk)
+                for start in range(0, len(centers), chunk)
+            ])
+        index = Helper.window_indices(len(points), count // 2, centers)
+        x, y = points.x[index], points.y[index]
+        A = np.stack((x**2, y**2, x*y, x, y), axis=-1)
+        B = np.ones(A.shape[:-1] + (1,))
+        if count > 5:
+            # least squares through a batched SVD, A = U S V^T
+            u, s, vt = np.linalg.svd(A, full_matrices=False)
+            regular = s[:, -1] > s[:, 0] * count * np.finfo(A.dtype).eps
+            if instrument.active is not None:
+                instrument.count('fit_conics.singular', len(regular) - np.count_nonzero(regular))
+            result = np.full(s.shape, np.nan)
+            w = u[regular].sum(axis=-2) / s[regular]
+            result[regular] = np.einsum('nji,nj->ni', vt[regular], w)
+            return result
+        try:
+            return np.linalg.solve(A, B)[..., 0]
+        except np.linalg.LinAlgError:
+            s = np.linalg.svd(A, compute_uv=False)
+            regular = s[:, -1] > s[:, 0] * A.shape[-1] * np.finfo(A.dtype).eps
+            if instrument.active is not None:
+                instrument.count('fit_conics.singular', len(regular) - np.count_nonzero(regular))
+            result = np.full(B.shape[:-1], np.nan)
+            result[regular] = np.linalg.solve(A[regular], B[regular])[..., 0]
+            return result
+
+    @staticmethod
+    def singular_windows(values):
+        return np.flatnonzero(np.isnan(values).any(axis=1))
+
+    @staticmethod
+    def calculate(points, batched=True, count=5, stride=1):
+        if batched:
+            if stride == 1:
+                return Helper.fit_conics(points, count=count)
+            # fit every stride-th window and interpolate the coefficients
+            # in between, the curve is closed so the last gap wraps around
+            length = len(points)
+            centers = np.arange(0, length, stride)
+            values = Helper.fit_conics(points, centers, count)
+            return np.column_stack([
+                np.interp(np.arange(length), centers, column, period=length)
+                for column in values.T
+            ])
         result = []
         for i in range(0, len(points)):
             try:
                 solution = Helper.solve_system(i, points)
-                result.append(solution)
-            except:
-                sys.exit()
-        return result
+            except np.linalg.LinAlgError:
+                solution = np.full(5, np.nan)
+            result.append(solution)
+        return np.asarray(result)
 
     @staticmethod
     def split(oval):
@@ -62,6 +121,7 @@ class Helper:
 
     @staticmethod
     def draw_segment(s):
+        import matplotlib.pyplot as plt
         x = [s.p1.x, s.p2.x]
         y = [s.p1.y, s.p2.y]
         plt.plot(x, y, [2])
@@ -75,150 +135,339 @@ class Helper:
 
     @staticmethod
     def draw_sys_solutions(points, values):
-        x = np.asarray([item.x for item in points])
+        import matplotlib.pyplot as plt
+        x = PointArray.from_points(points).x
         y = np.asarray([item[0] for item in values])
         plt.scatter(x, y, [2 for i in x])
 
     @staticmethod
-    def find_conjugation_points(points, values, delta=0.1**4):
-        result = []
-        evaluate = lambda a, b: abs(a - b) < delta
-        c1 = [item[0] for item in values]
-        for i in range(len(points)):
-            window = Helper.window(i, c1, 4)
-            if (
-                evaluate(window[0], window[1]) and
-                evaluate(window[-2], window[-1]) and
-                not evaluate(window[2], window[0]) and
-                not evaluate(window[3], window[0]) and
-                not evaluate(window[4], window[0]) #and
-                # not evaluate(window[-4], window[-1])
-            ):
-                result.append(points[i - 1])
+    def conjugation_mask(values, delta=0.1**4, size=2, centers=None):
+        # the plateau test at every center (all by default): values are flat
+        # before and after it and jump in between, center - 1 is the index
+        # of a conjugation point; it reads values[center - size - 2] up to
+        # values[center + size + 2]
+        c1 = np.asarray(values)[:, 0]
+        if centers is None:
+            centers = np.arange(len(c1))
+        shifted = lambda k: c1[(centers + k) % len(c1)]
+        evaluate = lambda a, b: np.abs(a - b) < delta
+        before = shifted(-size - 2)
+        found = (
+            evaluate(before, shifted(-size - 1)) &
+            evaluate(shifted(size + 1), shifted(size + 2))
+        )
+        for k in range(-size, 1):
+            found &= ~evaluate(shifted(k), before)
+        return found
+
+    @staticmethod
+    def jump_size(count=5, stride=1):
+        # half the width of a jump in the values of calculate(points, count=count,
+        # stride=stride) between two conic arcs: count // 2 of the fit, plus
+        # the stride if it was interpolated
+        return count // 2 + (stride if stride > 1 else 0)
+
+    @staticmethod
+    def conjugation_indices(values, delta=0.1**4, size=2):
+        # size is Helper.jump_size of the fit that gave values
+        return Helper.plateau_indices(Helper.conjugation_mask(values, delta, size), size)
+
+    @staticmethod
+    def plateau_indices(found, size=2):
+        # the conjugation indices of a conjugation_mask; one junction can pass
+        # the test at a few centers up to 2 * size apart, each run of those
+        # (cyclic, the curve is closed) counts once, by its first index
+        n = len(found)
+        centers = np.flatnonzero(found)
+        if len(centers) > 1:
+            first = np.diff(centers, prepend=centers[-1] - n) > 2 * size
+            centers = centers[first] if first.any() else centers[:1]
+        return (centers - 1) % n
+
+    @staticmethod
+    def best_four(indices):
+        # maximizes |i1 - i0| * |i2 - i1| * |i3 - i2| * |i3 - i0| over sorted
+        # quadruples; moving i0 down or i3 up only grows the product, so the
+        # optimum always takes the first and the last index
+        indices = np.sort(np.asarray(indices, dtype=np.int64))
+        first, last, inner = indices[0], indices[-1], indices[1:-1]
+        b, c = inner[:, None], inner[None, :]
+        score = np.where(b < c, (b - first) * (c - b) * (last - c), -1)
+        b, c = np.unravel_index(np.argmax(score), score.shape)
+        return np.asarray([first, inner[b], inner[c], last])
+
+    @staticmethod
+    def find_conjugation_points(points, values, delta=0.1**4, size=None, count=5, stride=1):
+        # values of calculate(points, count=count, stride=stride), size is
+        # derived from those unless given; interpolated values only tell the
+        # junctions within a stride, they are searched again at full resolution
+        if size is None:
+            size = Helper.jump_size(count, stride)
+        result = Helper.conjugation_indices(values, delta, size)
         if len(result) < 4:
             raise Exception('Found only {} conjugation points'.format(len(result)))
         if len(result) > 4:
-            distances = sorted(
-                [
-                    (
-                        comb,
-                        # reduce(lambda a, b: a * b, [Segment(comb[0], comb[i]).len for i in range(1, len(comb))]) *
-                        reduce(lambda a, b: a * b, [abs(points.index(comb[i]) - points.index(comb[i-1])) for i in range(len(comb))])
-                    )
-                    for comb in itertools.combinations(result, 4)
-                ],
-                reverse=True,
-                key=lambda item: item[1]
-            )
-            result = list(distances[0][0])
-            result = sorted(
-                [
-                    (item, points.index(item))
-                    for item in result
-                ],
-                key=lambda item: item[1]
-            )
-            result = [item[0] for item in result]
+            result = Helper.best_four(result)
+        if stride > 1:
+            result = Helper.refine_conjugation_indices(points, result, stride, delta, count)
+        return points[result]
+
+    @staticmethod
+    def refine_conjugation_indices(points, indices, reach, delta=0.1**4, count=5):
+        # the windows within reach of every index fitted one by one, the index
+        # moves where their plateau test gives a single one
+        points = PointArray.from_points(points)
+        size = count // 2
+        margin = size + 3
+        near = (np.asarray(indices)[:, None] + np.arange(-reach - margin, reach + margin + 1)) % len(points)
+        result = np.array(indices)
+        for k in range(len(near)):
+            found = Helper.inner_indices(Helper.fit_conics(points, near[k], count), delta, size, margin)
+            if len(found) == 1:
+                result[k] = near[k, found[0]]
         return result
 
+    @staticmethod
+    def inner_indices(values, delta, size, margin):
+        # conjugation_indices of the values of a stretch of the curve, only
+        # those at least margin from both ends; the plateau test wraps around
+        # there, which is not the curve
+        found = Helper.conjugation_mask(values, delta, size)
+        found[:margin + 1] = found[len(found) - margin + 1:] = False
+        return Helper.plateau_indices(found, size)
+
+    @staticmethod
+    def coarse_conjugation_indices(points, decimate=16, delta=0.1**4, size=2):
+        # conjugation indices found on every decimate-th point and refined
+        # around each of them at full resolution, by the plateau test where it
+        # gives a single index, else by the point nearest to both conics;
+        # None if the decimated contour does not show four of them
+        points = PointArray.from_points(points)
+        n = len(points)
+        values = Helper.fit_conics(points[::decimate])
+        m = len(values)
+        coarse = Helper.conjugation_indices(values, delta, size)
+        if len(coarse) < 4:
+            return None
+        if len(coarse) > 4:
+            coarse = Helper.best_four(coarse)
+        # the junction lies between the last window on the left arc and the
+        # first one on the right arc, the ones the plateau test compared
+        left, right = values[(coarse - size - 1) % m], values[(coarse + size + 3) % m]
+        margin = size + 3
+        near = (coarse[:, None] * decimate + np.arange(-decimate - margin, 3 * decimate + margin + 1)) % n
+        result = []
+        for k in range(len(coarse)):
+            found = Helper.inner_indices(Helper.fit_conics(points, near[k]), delta, size, margin)
+            if len(found) == 1:
+                result.append(near[k, found[0]])
+                continue
+            inner = near[k, margin:-margin]
+            x, y = points.x[inner].astype(float), points.y[inner].astype(float)
+            A = np.column_stack((x**2, y**2, x*y, x, y))
+            residual = np.maximum(np.abs(A @ left[k] - 1), np.abs(A @ right[k] - 1))
+            result.append(inner[np.argmin(residual)])
+        return np.asarray(result)
+
+    @staticmethod
+    def find_conjugation_points_coarse(points, decimate=16, delta=0.1**4, size=2):
+        # O(n / decimate + decimate) instead of fitting every window, falls
+        # back to the full search on contours too short to decimate
+        result = Helper.coarse_conjugation_indices(points, decimate, delta, size)
+        if result is None:
+            return Helper.find_conjugation_points(points, Helper.calculate(points), delta, size)
+        return points[result]
+
     @staticmethod
     def points_to_x_y(points):
-        x = [item.x for item in points]
-        y = [item.y for item in points]
-        return x, y
+        points = PointArray.from_points(points)
+        return points.x, points.y
+
+    @staticmethod
+    def chords(oval, step=1, indices=None):
+        # crossings of the lines through oval.points[i] and its opposite point,
+        # the one nearer to the opposite point first as in Curve.cross_segment,
+        # for every step-th i or the given indices
+        xy = oval.points.xy
+        i = np.arange(0, len(xy), step) if indices is None else np.asarray(indices, dtype=int)
+        l_2 = int(len(xy)/2)
+        origins = xy[np.where(i + l_2 >= len(xy), i - l_2, i + l_2)]
+        crossing, count = oval.grid.cross_lines(origins, xy[i] - origins)
+        dist = np.hypot(*np.moveaxis(crossing - origins[:, None], -1, 0))
+        swap = dist[:, 1] < dist[:, 0]
+        crossing[swap] = crossing[swap, ::-1]
+        return crossing, count >= 2
+
+    @staticmethod
+    def get_inner_curves(oval, cross_point, wurfs, step=1):
+        crossing, found = Helper.chords(oval, step)
+        p3, valid = last_points(
+            crossing[:, 0], (cross_point.x, cross_point.y), crossing[:, 1],
+            np.asarray(wurfs, dtype=float)[:, None],
+        )
+        return [PointArray(p[v]) for p, v in zip(p3, valid & found)]
 
     @staticmethod
     def get_inner_curve(oval, cross_point, wurf, step=1):
-        def get_p3(p1, p2):
-            cross = oval.cross_segment(Segment(p1, p2))
-            w = WURF.last_point(cross[0], cross_point, cross[1], wurf)
-            if not w:
-                # print('getting wurf: D < 0')
-                return None
-                raise Exception('getting wurf: D < 0')
-            return w.p3
+        return Helper.get_inner_curves(oval, cross_point, [wurf], step)[0]
 
-        result = []
-        l_2 = int(len(oval.points)/2)
-        for i in range(0, len(oval.points), step):
-            index = i + l_2
-            if index >= len(oval.points):
-                index = i - l_2
-            p3 = get_p3(oval.points[index], oval.points[i])
-            result.append(p3)
-        return result
+    @staticmethod
+    def tangents(points, centers=None):
+        # directions of Curve.tangent for every point (or the centers),
+        # pointing up (down the old (x*k, y) sort order of points on it)
+        window = points.xy[Helper.window_indices(len(points), 2, centers)]
+        directions = window[:, 0] + window[:, 1] - window[:, 3] - window[:, 4]
+        down = (directions[:, 1] < 0) | ((directions[:, 1] == 0) & (directions[:, 0] < 0))
+        directions[down] *= -1
+        return directions
+
+    @staticmethod
+    def wurf_signature(first, second, main, indices=None):
+        # wurf values of the tangents at every point of first, or at indices
+        xy = first.points.xy
+        directions = Helper.tangents(first.points, indices)
+        if indices is not None:
+            xy = xy[indices]
+        inner, inner_count = second.grid.cross_lines(xy, directions)
+        outer, outer_count = main.grid.cross_lines(xy, directions)
+        points = np.concatenate((outer, inner, xy[:, None]), axis=1)
+        t = ((points - xy[:, None]) * directions[:, None]).sum(axis=-1)
+        order = np.argsort(t, axis=1)
+        [p1, p2, p3, p4, p5] = np.moveaxis(np.take_along_axis(points, order[..., None], axis=1), 1, 0)
+        result = np.column_stack((
+            wurf_values(p1, p2, p3, p5),
+            wurf_values(p1, p2, p4, p5),
+        ))
+        found = (inner_count >= 2) & (outer_count >= 2) & np.isfinite(result).all(axis=1)
+        if instrument.active is not None:
+            instrument.count('wurf_mapping.skipped', len(found) - np.count_nonzero(found))
+        result[~found] = np.nan
+        return result, found
 
     @staticmethod
     def wurf_mapping(first, second, main):
-        result = []
-        for i in range(0, len(first.points), 1):
-            window = Helper.window(i, first.points, 2)
-            tg = first.tangent(*window)
-            try:
-                [p2, p4] = second.cross_segment(tg)
-                [p1, p5] = main.cross_segment(tg)
-            except:
-                continue
-            else:
-                p3 = first.points[i]
-                [p1, p2, p3, p4, p5] = sorted(
-                    [p1, p2, p3, p4, p5],
-                    key=lambda item: (item.x*tg.k, item.y)
-                )
-                w1 = WURF(p1, p2, p3, p5)
-                w2 = WURF(p1, p2, p4, p5)
-                result.append(Point(w1.value, w2.value))
-                # x, y = Helper.points_to_x_y([p1, p2, p3, p4, p5])
-                # plt.scatter(x, y)
-        return result
+        result, found = Helper.wurf_signature(first, second, main)
+        return PointArray(result[found])
 
 
     @staticmethod
-    def main(oval, subplot=None):
+    def filter_outliers(points, delta=0.01):
+        # keeps points whose nearest neighbour is closer than delta, which is
+        # a squared distance as FLANN used to report it
+        points = PointArray.from_points(points)
+        radius = delta ** 0.5
+        with instrument.stage('filter_outliers.index'):
+            grid = PointGrid(points)
+        distances, indices = grid.nearest(points.xy, 2, radius)
+        keep = distances[:, 1] ** 2 < delta
+        if instrument.active is not None:
+            instrument.count('filter_outliers.rejected', len(keep) - np.count_nonzero(keep))
+        return points[keep]
+
+    @staticmethod
+    def pipeline(oval, wurfs=(2, 1.5), cache=None, key=None, report=False, decimate=None, resample=None,
+                 count=5, stride=1):
+        # oval -> conjugation points -> inner curves -> wurf map -> filter,
+        # every stage is kept for the caller and nothing is drawn; with a
+        # cache.Cache every stage is memoized under key, the generating
+        # parameters of oval, and the parameters of the stages up to it;
+        # report=True adds the instrument report, 'profile' also samples;
+        # with decimate the conjugation points are searched coarse to fine
+        # and the conics of every window are not fitted (values is None);
+        # resample evens out the inner curves to that many points by arc
+        # length, which bounds the tangents and crossings of the wurf map;
+        # count and stride are those of Helper.calculate
+        if report:
+            with instrument.recording(profile=report == 'profile') as recorded:
+                result = Helper.pipeline(
+                    oval, wurfs, cache, key, decimate=decimate, resample=resample, count=count, stride=stride,
+                )
+            result['report'] = recorded.as_dict()
+            return result
+        if cache is not None and key is None:
+            # stages keyed by None alone would be shared by every oval
+            raise Exception('A cache needs the key of the oval')
+
+        def stage(name, compute, *params):
+            with instrument.stage(name):
+                if cache is None:
+                    return compute()
+                return cache.memoize([key, name] + list(params), compute)
+
+        wurfs = [float(w) for w in wurfs]
+        values = None
+        if decimate is None:
+            values = stage(
+                'values', lambda: {'values': Helper.calculate(oval.points, count=count, stride=stride)},
+                count, stride,
+            )['values']
+
+        def conjugation():
+            if decimate is None:
+                points = Helper.find_conjugation_points(oval.points, values, count=count, stride=stride)
+            else:
+                points = Helper.find_conjugation_points_coarse(oval.points, decimate)
+            cross_point = Segment.cross(Segment(points[0], points[2]), Segment(points[1], points[3]))
+            return {'points': points.xy, 'cross_point': np.asarray([cross_point.x, cross_point.y])}
+        found = stage('conjugation', conjugation, *([count, stride] if decimate is None else [decimate]))
+        points = PointArray(found['points'])
+        cross_point = Point(*found['cross_point'].tolist())
+        # the later stages depend on the conjugation search only through the
+        # cross point, which keys them whatever found it
+        cross = [cross_point.x, cross_point.y]
+
+        def inner_curves():
+            curves = Helper.get_inner_curves(oval, cross_point, wurfs, 1)
+            return {'curve_{}'.format(i): curve.xy for i, curve in enumerate(curves)}
+        found = stage('inner_curves', inner_curves, wurfs, cross)
+        curves = [PointArray(found['curve_{}'.format(i)]) for i in range(len(wurfs))]
+
+        def wurf_mapping():
+            first, second = [Curve.from_points(curve, oval.step) for curve in curves]
+            if resample is not None:
+                # not before the chords, they pair points i and i + n / 2
+                first, second = first.resample(resample), second.resample(resample)
+            return {'wurf_map': Helper.wurf_mapping(first, second, oval).xy}
+        wurf_map = PointArray(stage('wurf_map', wurf_mapping, wurfs, cross, resample)['wurf_map'])
+        signature = stage('signature', lambda: {'signature': Helper.filter_outliers(wurf_map).xy}, wurfs, cross, resample)
+        return {
+            'values': values,
+            'conjugation_points': points,
+            'cross_point': cross_point,
+            'inner_curves': curves,
+            'wurf_map': wurf_map,
+            'signature': PointArray(signature['signature']),
+        }
+
+    @staticmethod
+    def draw_pipeline(oval, result, subplot=None):
+        import matplotlib.pyplot as plt
         if subplot:
             plt.subplot(subplot)
         oval.draw()
-
-        points = Helper.find_conjugation_points(oval.points, Helper.calculate(oval.points))
-        cross_point = Segment.cross(Segment(points[0], points[2]), Segment(points[1], points[3]))
-        print(cross_point)
-        x, y = Helper.points_to_x_y(points + [cross_point])
-        # x, y = Helper.points_to_x_y(points)
-
+        x, y = Helper.points_to_x_y(result['conjugation_points'] + [result['cross_point']])
         plt.scatter(x, y)
+        for curve in result['inner_curves']:
+            x, y = Helper.points_to_x_y(curve)
+            plt.scatter(x, y, [2])
 
-        curve = Helper.get_inner_curve(oval, cross_point, 2, 1)
-        first = Curve.from_points(tuple(curve), step)
-        x, y = Helper.points_to_x_y(curve)
-        plt.scatter(x, y, [2])
-
-        curve = curve = Helper.get_inner_curve(oval, cross_point, 1.5, 1)
-        second = Curve.from_points(tuple(curve), step)
-        x, y = Helper.points_to_x_y(curve)
-        plt.scatter(x, y, [2])
-
-        wurf_map = Helper.wurf_mapping(first, second, oval)
-        result = []
-        for i in range(len(wurf_map)):
-            nearest, dist = FLANN().nn(
-                np.asarray([(item.x, item.y) for item in wurf_map if item != wurf_map[i]]),
-                np.asarray([(item.x, item.y) for item in wurf_map if item == wurf_map[i]]),
-                1, algorithm="kmeans",
-            )
-            # print(dist)
-            if dist[0] < 0.01:
-                result.append(wurf_map[i])
-            # else:
-            #     print('here')
-        return result
+    @staticmethod
+    def main(oval, subplot=None, plot=True):
+        result = Helper.pipeline(oval)
+        print(result['cross_point'])
+        if plot:
+            Helper.draw_pipeline(oval, result, subplot)
+        return result['signature']
 
     @staticmethod
-    def main_main(oval, number):
+    def main_main(oval, number, plot=True):
         number *= 4
         # print(len(oval.points))
         # wurf_map_1 = Helper.main(oval, 241 + number)
-        plt.subplot(241 + number)
-        oval.draw()
+        if plot:
+            import matplotlib.pyplot as plt
+            plt.subplot(241 + number)
+            oval.draw()
 
         projected_1 = Curve.from_proj(Projection(
             1.5, 1, 0,
@@ -226,7 +475,7 @@ class Helper:
             0, 0.2,
         ), oval.points[0::2], step)
         print(len(projected_1.points))
-        wurf_map_2 = Helper.main(projected_1, 242 + number)
+        wurf_map_2 = Helper.main(projected_1, 242 + number, plot)
         #
         projected_2 = Curve.from_proj(Projection(
             1.5, 1, 0,
@@ -234,7 +483,7 @@ class Helper:
             0.2, 0.1,
         ), oval.points[1::2], step)
         print(len(projected_2.points))
-        wurf_map_3 = Helper.main(projected_2, 243 + number)
+        wurf_map_3 = Helper.main(projected_2, 243 + number, plot)
 
         # projected_2 = Curve.from_proj(Projection(
         #     1.5, 1, 1,
@@ -247,13 +496,14 @@ class Helper:
         # x, y = Helper.points_to_x_y(wurf_map_1)
         # plt.scatter(x, y, [2])
         #
-        plt.subplot(244 + number)
-        x, y = Helper.points_to_x_y(wurf_map_2)
-        plt.scatter(x, y, [2])
-        #
-        plt.subplot(244 + number)
-        x, y = Helper.points_to_x_y(wurf_map_3)
-        plt.scatter(x, y, [2])
+        if plot:
+            plt.subplot(244 + number)
+            x, y = Helper.points_to_x_y(wurf_map_2)
+            plt.scatter(x, y, [2])
+            #
+            plt.subplot(244 + number)
+            x, y = Helper.points_to_x_y(wurf_map_3)
+            plt.scatter(x, y, [2])
 
         print('Frechet distance is')
         print(Frechet.dist(wurf_map_2, wurf_map_3))
@@ -278,8 +528,9 @@ if __name__ == '__main__':
     oval = Oval(e1, e2, center, step)
     m3, m4 = Helper.main_main(oval, 1)
 
-    # print(Frechet.dist(m1, m3))
-    # print(Frechet.dist(m2, m4))
+    print('Pairwise Frechet distances are')
+    print(Frechet.pairwise([m1, m2, m3, m4]))
 
+    import matplotlib.pyplot as plt
     plt.show()
 
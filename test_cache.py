@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from cache import Cache
+from curves import Oval, Curve, Ellipse, Circle
+from geometry import Point, Projection
+from main import Helper
+
+
+STEP = 0.001
+
+
+class LoggedCache(Cache):
+    # every memoized stage by name, and whether it was computed
+
+    def __init__(self, *args, **kwargs):
+        super(LoggedCache, self).__init__(*args, **kwargs)
+        self.log = []
+
+    def memoize(self, params, compute):
+        computed = []
+        result = super(LoggedCache, self).memoize(params, lambda: computed.append(True) or compute())
+        self.log.append((params[1], bool(computed)))
+        return result
+
+
+def hits_and_misses(result):
+    counters = result['report']['counters']
+    return counters.get('cache.hits', 0), counters.get('cache.misses', 0)
+
+
+@pytest.fixture
+def view():
+    # the first view of main.py
+    oval = Oval(Ellipse(5, 1, STEP), Circle(1, 0, 0, STEP), Point(2, 0), STEP)
+    return Curve.from_proj(Projection(1.5, 1, 0, 1, 2, 0, 0, 0.2), oval.points[0::2], STEP)
+
+
+def test_pipeline(view, tmp_path):
+    cache = LoggedCache(str(tmp_path), salt='test')
+    key = ['view', STEP]
+    stages = ['values', 'conjugation', 'inner_curves', 'wurf_map', 'signature']
+    expected = Helper.pipeline(view)['signature'].xy
+    result = Helper.pipeline(view, cache=cache, key=key, report=True)
+    assert cache.log == [(name, True) for name in stages]
+    assert hits_and_misses(result) == (0, 5)
+    assert np.array_equal(result['signature'].xy, expected)
+
+    del cache.log[:]
+    result = Helper.pipeline(view, cache=cache, key=key, report=True)
+    assert cache.log == [(name, False) for name in stages]
+    assert hits_and_misses(result) == (5, 0)
+    assert np.array_equal(result['signature'].xy, expected)
+
+    # other wurfs redo the inner curves on, not the conics and conjugation points
+    del cache.log[:]
+    result = Helper.pipeline(view, wurfs=(2, 1.25), cache=cache, key=key)
+    assert cache.log == [(name, name not in ('values', 'conjugation')) for name in stages]
+    assert np.array_equal(result['signature'].xy, Helper.pipeline(view, wurfs=(2, 1.25))['signature'].xy)
+
+
+def test_needs_key(view, tmp_path):
+    with pytest.raises(Exception, match='key'):
+        Helper.pipeline(view, cache=Cache(str(tmp_path), salt='test'))
+
+
+def test_evict(tmp_path):
+    cache = Cache(str(tmp_path), limit=float('inf'), salt='test')
+    keys = [cache.key(['entry', i]) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.store(key, {'x': np.zeros(1000)})
+        os.utime(cache.path(key), (1000 + i, 1000 + i))
+    size = cache.size() // 2
+    cache.limit = 2 * size
+    # loading the first entry makes the second the least recently used
+    assert cache.load(keys[0]) is not None
+    cache.store(keys[2], {'x': np.ones(1000)})
+    assert cache.size() == 2 * size
+    assert cache.load(keys[1]) is None
+    assert np.array_equal(cache.load(keys[0])['x'], np.zeros(1000))
+    assert np.array_equal(cache.load(keys[2])['x'], np.ones(1000))
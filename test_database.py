@@ -0,0 +1,65 @@
+import numpy as np
+
+from database import SignatureDatabase
+from geometry import Frechet
+
+
+def signatures(rng, count):
+    # noisy arcs around a few centers, some of them outside the bounds
+    result = []
+    for i in range(count):
+        t = np.linspace(0, rng.uniform(1, 6), rng.integers(5, 40))
+        center = rng.uniform(-0.5, 1.5, 2)
+        arc = center + rng.uniform(0.05, 0.5) * np.column_stack((np.cos(t), np.sin(t)))
+        result.append(arc + 0.01 * rng.standard_normal(arc.shape))
+    return result
+
+
+def database(rng, count=30, **kwargs):
+    result = SignatureDatabase(**kwargs)
+    for i, signature in enumerate(signatures(rng, count)):
+        result.add('s{}'.format(i), signature)
+    return result
+
+
+def scan(db, xy, k, eps, band=None):
+    distances = [(name, Frechet.dist(xy, db[name], band)) for name in db.names]
+    return sorted([item for item in distances if item[1] <= eps], key=lambda item: item[1])[:k]
+
+
+def test_lower_bounds():
+    rng = np.random.default_rng(0)
+    for kwargs in ({}, {'bins': 4}, {'bins': 32, 'bounds': (0, 0, 1, 1)}):
+        db = database(rng, **kwargs)
+        for xy in signatures(rng, 20):
+            bounds = db.lower_bounds(xy)
+            distances = np.asarray([Frechet.dist(xy, db[name]) for name in db.names])
+            assert (bounds <= distances * (1 + 1e-12)).all()
+
+
+def test_save_load(tmp_path):
+    rng = np.random.default_rng(1)
+    db = database(rng, bins=8, bounds=(0, 0, 1, 1))
+    path = str(tmp_path / 'db.npz')
+    db.save(path)
+    loaded = SignatureDatabase.load(path)
+    assert loaded.names == db.names and loaded.bins == db.bins and loaded.bounds == db.bounds
+    assert loaded.dtype == db.dtype
+    for a, b in zip(loaded.signatures, db.signatures):
+        assert a.dtype == b.dtype and np.array_equal(a, b)
+    xy = signatures(rng, 1)[0]
+    assert loaded.query(xy, 3) == db.query(xy, 3)
+    # bounds taken from the references are not stored
+    db = database(rng, dtype=np.float64)
+    db.save(path)
+    loaded = SignatureDatabase.load(path)
+    assert loaded.bounds is None and loaded.dtype == np.float64
+    assert np.array_equal(loaded.lower_bounds(xy), db.lower_bounds(xy))
+
+
+def test_query():
+    rng = np.random.default_rng(2)
+    db = database(rng)
+    for xy in signatures(rng, 10):
+        for k, eps, band in ((1, np.inf, None), (5, np.inf, None), (30, np.inf, None), (5, 0.3, None), (3, np.inf, 1)):
+            assert db.query(xy, k, eps, band) == scan(db, xy, k, eps, band)
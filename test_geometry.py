@@ -0,0 +1,76 @@
+import numpy as np
+
+from geometry import Frechet, PointGrid
+from main import Helper
+
+
+def brute_nearest(points, xy, k, radius):
+    distances = np.hypot(*(xy[:, None] - points[None]).transpose(2, 0, 1))
+    return np.sort(np.where(distances <= radius, distances, np.inf), axis=1)[:, :k]
+
+
+def brute_frechet(P, Q, band):
+    # the coupling recurrence cell by cell, band as |i * (m - 1) - j * (n - 1)| <= band * (n - 1)
+    n, m = len(P), len(Q)
+    ca = np.full((n, m), np.inf)
+    for i in range(n):
+        for j in range(m):
+            if abs(i * (m - 1) - j * (n - 1)) > band * (n - 1):
+                continue
+            d = np.sqrt(((P[i] - Q[j]) ** 2).sum())
+            if i or j:
+                d = max(d, min(
+                    ca[i - 1, j] if i else np.inf,
+                    ca[i, j - 1] if j else np.inf,
+                    ca[i - 1, j - 1] if i and j else np.inf,
+                ))
+            ca[i, j] = d
+    return ca[-1, -1]
+
+
+def test_frechet_band_edges():
+    # the rounded float edges of the band dropped cells of (19, 5) and (31, 7)
+    rng = np.random.default_rng(0)
+    for seed in range(20):
+        for n, m in ((19, 5), (31, 7), (7, 7), (12, 4), (9, 2)):
+            P, Q = rng.random((n, 2)), rng.random((m, 2))
+            for band in (0, 0.5, 1, 2, 3.5):
+                assert np.isclose(Frechet.dist(P, Q, band), brute_frechet(P, Q, band))
+    assert Frechet.dist(P, Q, -1) == np.inf
+
+
+def test_frechet_within():
+    rng = np.random.default_rng(0)
+    for seed in range(100):
+        n, m = rng.integers(1, 40, 2)
+        P, Q = rng.random((n, 2)), rng.random((m, 2))
+        if seed % 2:
+            # close curves, where the free space has to be walked
+            Q = P[np.sort(rng.integers(0, n, m))] + 0.05 * rng.standard_normal((m, 2))
+        d = Frechet.dist(P, Q)
+        for eps in (0.999 * d, d, 1.001 * d):
+            assert Frechet.within(P, Q, eps) == (d <= eps) == Frechet.within(Q, P, eps)
+
+
+def test_filter_outliers_two_points():
+    points = np.array([[0.5, 0.5], [0.55, 0.5]])
+    assert np.array_equal(Helper.filter_outliers(points).xy, points)
+
+
+def test_filter_outliers_collinear():
+    x = np.linspace(0, 1, 200)
+    for points in (np.column_stack((x, x * 0)), np.column_stack((x * 0, x)), np.column_stack((x, 2 * x + 1))):
+        assert len(Helper.filter_outliers(points)) == 200
+    assert len(Helper.filter_outliers(np.zeros((5, 2)))) == 5
+
+
+def test_point_grid_degenerate():
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 1, 200)
+    queries = rng.random((50, 2)) * 6 - 3
+    for points in (np.column_stack((x, x * 0)), rng.random((300, 2)) * [1, 1e-9], np.zeros((3, 2))):
+        grid = PointGrid(points)
+        xy = np.concatenate((points, queries))
+        for radius in (0.01, 0.1, 10, np.inf):
+            distances, indices = grid.nearest(xy, 2, radius)
+            assert np.array_equal(distances, brute_nearest(points, xy, 2, radius))
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from curves import Oval, Curve, Ellipse, Circle
+from geometry import Point, Projection
+from incremental import IncrementalSignature
+from main import Helper
+
+
+STEP = 0.001
+
+
+@pytest.fixture
+def view():
+    # the first view of main.py
+    oval = Oval(Ellipse(5, 1, STEP), Circle(1, 0, 0, STEP), Point(2, 0), STEP)
+    return Curve.from_proj(Projection(1.5, 1, 0, 1, 2, 0, 0, 0.2), oval.points[0::2], STEP).points.xy.copy()
+
+
+def assert_same(incremental, xy):
+    result = Helper.pipeline(Curve.from_points(xy, STEP))
+    for a, b in zip(incremental.inner_curves, result['inner_curves']):
+        assert np.array_equal(a.xy, b.xy)
+    assert np.array_equal(incremental.wurf_map.xy, result['wurf_map'].xy)
+    assert np.array_equal(incremental.signature.xy, result['signature'].xy)
+
+
+def test_local_edits(view):
+    incremental = IncrementalSignature(view, STEP)
+    assert_same(incremental, view)
+    rng = np.random.default_rng(1)
+    xy = view.copy()
+    for trial in range(20):
+        start, count = int(rng.integers(0, len(xy) - 8)), int(rng.integers(1, 8))
+        points = xy[start:start + count] * (1 + 1e-4 * rng.standard_normal((count, 1)))
+        edited = np.concatenate((xy[:start], points, xy[start + count:]))
+        try:
+            Helper.pipeline(Curve.from_points(edited, STEP))
+        except Exception:
+            # an edit that loses a conjugation point fails the same way
+            # and leaves the signature as it was
+            with pytest.raises(Exception):
+                incremental.update(start, start + count, points)
+            assert_same(incremental, xy)
+            continue
+        incremental.update(start, start + count, points)
+        xy = edited
+        assert_same(incremental, xy)
+
+
+def test_count_changes(view):
+    incremental = IncrementalSignature(view, STEP)
+    incremental.update(100, 102, view[100:101])
+    xy = np.concatenate((view[:101], view[102:]))
+    assert_same(incremental, xy)
+    incremental.append(view[:1] * 0.999 + view[-1:] * 0.001)
+    xy = np.concatenate((xy, view[:1] * 0.999 + view[-1:] * 0.001))
+    assert_same(incremental, xy)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from curves import Oval, Curve, Ellipse, Circle
+from geometry import Point, Projection
+from main import Helper
+
+
+def views(step):
+    # the four views of main.py
+    for e1, e2 in ((Ellipse(5, 1, step), Circle(1, 0, 0, step)), (Ellipse(6, 1, step), Ellipse(2, 1, step))):
+        oval = Oval(e1, e2, Point(2, 0), step)
+        yield Curve.from_proj(Projection(1.5, 1, 0, 1, 2, 0, 0, 0.2), oval.points[0::2], step)
+        yield Curve.from_proj(Projection(1.5, 1, 0, 1, 2, 0, 0.2, 0.1), oval.points[1::2], step)
+
+
+def conjugation_points(curve, count, stride):
+    values = Helper.calculate(curve.points, count=count, stride=stride)
+    xy = Helper.find_conjugation_points(curve.points, values, count=count, stride=stride).xy
+    # the refined indices may start at another of the four
+    return xy[np.lexsort(xy.T)]
+
+
+@pytest.mark.parametrize('step, fits', [
+    # the 200 point views have junctions 20 points apart, a stride of 8
+    # interpolates over them
+    (0.001, ((7, 1), (9, 1), (11, 1), (5, 2), (5, 4), (7, 4))),
+    (0.0001, ((7, 1), (9, 1), (11, 1), (5, 2), (5, 4), (7, 4), (9, 8), (5, 16))),
+])
+def test_count_and_stride(step, fits):
+    for curve in views(step):
+        expected = conjugation_points(curve, 5, 1)
+        for count, stride in fits:
+            assert np.array_equal(conjugation_points(curve, count, stride), expected), (count, stride)
+
+
+def test_compact_refused(tmp_path):
+    curve = next(views(0.001))
+    path = str(tmp_path / 'view.npy')
+    curve.save(path)
+    assert np.array_equal(Helper.pipeline(Curve.load(path, 0.001))['signature'].xy, Helper.pipeline(curve)['signature'].xy)
+    with pytest.raises(Exception, match='float32'):
+        Helper.pipeline(Curve.load(path, 0.001, compact=True))
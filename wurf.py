@@ -1,12 +1,13 @@
 from geometry import Segment, Point
 import numpy as np
 
+import instrument
+
 
 class WURF:
 
     def __init__(self, p1, p2, p3, p4):
         self.p1, self.p2, self.p3, self.p4 = p1, p2, p3, p4
-        self.a, self.b, self.c = Segment(p1, p2), Segment(p2, p3), Segment(p3, p4)
 
     def __str__(self):
         return '{}, {}, {}, {}'.format(self.p1, self.p2, self.p3, self.p4)
@@ -16,45 +17,74 @@ class WURF:
 
     @property
     def value(self):
-        la, lb, lc = self.a.len, self.b.len, self.c.len
-        return (la + lb) * (lb + lc) / (lb * (la + lb + lc))
+        return float(wurf_values(*(_xy(p) for p in (self.p1, self.p2, self.p3, self.p4))))
 
     @staticmethod
     def last_point_1(p1, p2, p4, wurf_value, delta=0.1**3):
-        main = Segment(p1, p4)
-        y = lambda x: main.k * x + main.b
-        if p2.x > p4.x:
-            delta *= -1
-        current_x = p2.x
-        wurfs = []
-        while np.sign(delta)*current_x < p4.x:
-            current_x += delta
-            w = WURF(p1, p2, Point(current_x, y(current_x)), p4)
-            # print(w.value)
-            wurfs.append(w)
-        tmp = [abs(item.value - wurf_value) for item in wurfs]
-        return wurfs[tmp.index(min(tmp))]
+        count = max(1, int(Segment(p2, p4).len / delta))
+        p3 = search_last_points(_xy(p1), _xy(p2), _xy(p4), wurf_value, count)
+        return WURF(p1, p2, Point(*p3.tolist()), p4)
 
     @staticmethod
     def last_point(p1, p2, p4, wurf_value):
-        main = Segment(p1, p4)
-        y = lambda x: main.k * x + main.b
-        a = Segment(p1, p2)
-        b_c = Segment(p2, p4)
-        l = a.len / (((wurf_value * (a.len + b_c.len)) / b_c.len) - 1)
-        l = l**2
-        ua = 1 + (main.k**2)
-        ub = 2 * (main.k * main.b - p2.x - p2.y * main.k)
-        uc = (p2.x**2) + (p2.y**2) + (main.b**2) - 2*p2.y*main.b - l
-        D = (ub ** 2) - (4 * ua * uc)
-        if D < 0:
+        p3, valid = last_points(_xy(p1), _xy(p2), _xy(p4), wurf_value)
+        if not valid:
             return None
-        x1 = (-ub + D ** 0.5) / (2 * ua)
-        x2 = (-ub - D ** 0.5) / (2 * ua)
-        w1, w2 = WURF(p1, p2, Point(x1, y(x1)), p4), WURF(p1, p2, Point(x2, y(x2)), p4)
-        result = w1
-        if (
-            (abs(w2.value - wurf_value) < abs(w1.value - wurf_value))
-        ):
-            result = w2
-        return result
+        return WURF(p1, p2, Point(*p3.tolist()), p4)
+
+
+def _xy(point):
+    return point.x, point.y
+
+
+def _length(v):
+    return np.sqrt((v ** 2).sum(axis=-1))
+
+
+def wurf_values(p1, p2, p3, p4):
+    # WURF(p1, p2, p3, p4).value over (..., 2) arrays
+    p1, p2, p3, p4 = (np.asarray(p, dtype=float) for p in (p1, p2, p3, p4))
+    la, lb, lc = _length(p2 - p1), _length(p3 - p2), _length(p4 - p3)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (la + lb) * (lb + lc) / (lb * (la + lb + lc))
+
+
+def last_points(p1, p2, p4, wurf_value):
+    # array form of WURF.last_point: the points broadcast as (..., 2) arrays
+    # against wurf_value, returns p3 and a mask of the solvable (D >= 0) cases
+    p1, p2, p4 = (np.asarray(p, dtype=float) for p in (p1, p2, p4))
+    wurf_value = np.asarray(wurf_value, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a, b_c = _length(p2 - p1), _length(p4 - p2)
+        l = a / (((wurf_value * (a + b_c)) / b_c) - 1)
+        # p3 = p1 + t * u lies on the circle of radius l around p2
+        u = (p4 - p1) / _length(p4 - p1)[..., None]
+        e = p1 - p2
+        half_b = (u * e).sum(axis=-1)
+        D = half_b ** 2 - (e ** 2).sum(axis=-1) + l ** 2
+        valid = D >= 0
+        root = np.sqrt(np.where(valid, D, np.nan))
+        x1 = p1 + (-half_b + root)[..., None] * u
+        x2 = p1 + (-half_b - root)[..., None] * u
+    if instrument.active is not None:
+        instrument.count('last_points.failed', valid.size - np.count_nonzero(valid))
+    closer = (
+        np.abs(wurf_values(p1, p2, x2, p4) - wurf_value) <
+        np.abs(wurf_values(p1, p2, x1, p4) - wurf_value)
+    )
+    return np.where(closer[..., None], x2, x1), valid
+
+
+def search_last_points(p1, p2, p4, wurf_value, count=1000):
+    # brute force counterpart of last_points for checking it: tries count
+    # points of the line p1 p4 between the projection of p2 and p4
+    p1, p2, p4 = np.broadcast_arrays(*(np.asarray(p, dtype=float) for p in (p1, p2, p4)))
+    wurf_value = np.broadcast_to(wurf_value, p1.shape[:-1])
+    direction = p4 - p1
+    start = ((p2 - p1) * direction).sum(axis=-1) / (direction ** 2).sum(axis=-1)
+    t = start[..., None] + (1 - start)[..., None] * np.linspace(0, 1, count + 1)[1:]
+    p3 = p1[..., None, :] + t[..., None] * direction[..., None, :]
+    values = wurf_values(p1[..., None, :], p2[..., None, :], p3, p4[..., None, :])
+    error = np.abs(values - np.asarray(wurf_value)[..., None])
+    best = np.argmin(np.where(np.isnan(error), np.inf, error), axis=-1)
+    return np.take_along_axis(p3, best[..., None, None], axis=-2)[..., 0, :]